@@ -1,8 +1,10 @@
-import csv
 import hashlib
-import os
+import threading
 import uuid
 
+from events import EventSource
+from storage import open_table
+
 ADMINS_FILE = "admins.csv"
 
 class Admin:
@@ -15,46 +17,58 @@ class Admin:
     def _hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
 
-class AdminManager:
-    def __init__(self, file_path=ADMINS_FILE):
+class AdminManager(EventSource):
+    # events: "load" (None) and "add" (the Admin)
+    def __init__(self, file_path=ADMINS_FILE, backend=None):
         self.file_path = file_path
+        self._lock = threading.RLock()
+        self.table = open_table("admins", file_path, rows=self._rows, backend=backend, lock=self._lock)
         self.admins = {}  # key: username, value: Admin instance
         self._load_admins()
 
     def _load_admins(self):
-        if not os.path.exists(self.file_path):
-            return
-        with open(self.file_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
+        with self._lock:
+            admins = {}
+            for row in self.table.load():
                 admin = Admin(row["username"], row["password_hash"], row["name"])
                 admin.admin_id = row["admin_id"]
                 admin.password_hash = row["password_hash"]  # already hashed
-                self.admins[admin.username] = admin
+                admins[admin.username] = admin
+            self.admins = admins
+            self._emit("load")
+
+    def _row(self, admin):
+        return {
+            "admin_id": admin.admin_id,
+            "username": admin.username,
+            "name": admin.name,
+            "password_hash": admin.password_hash
+        }
+
+    def _rows(self):
+        return [self._row(admin) for admin in self.admins.values()]
 
     def _save_admins(self):
-        with open(self.file_path, "w", newline="", encoding="utf-8") as f:
-            fieldnames = ["admin_id", "username", "name", "password_hash"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for admin in self.admins.values():
-                writer.writerow({
-                    "admin_id": admin.admin_id,
-                    "username": admin.username,
-                    "name": admin.name,
-                    "password_hash": admin.password_hash
-                })
+        with self._lock:
+            self.table.save()
 
     def add_admin(self, username, password, name):
-        if username in self.admins:
-            print("Username already exists")
-            return None
-        admin = Admin(username, password, name)
-        self.admins[username] = admin
-        self._save_admins()
+        with self._lock:
+            if username in self.admins:
+                print("Username already exists")
+                return None
+            admin = Admin(username, password, name)
+            self.admins[username] = admin
+            self.table.insert(self._row(admin))
+            self._emit("add", admin)
         print(f"Admin {username} added successfully")
         return admin
 
+    def ensure_admin(self, username, password, name):
+        # idempotent bootstrap: only writes when the username is missing
+        admin = self.admins.get(username)
+        return admin or self.add_admin(username, password, name)
+
     def login(self, username, password):
         admin = self.admins.get(username)
         if not admin:
@@ -0,0 +1,155 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from flight import DEFAULT_SEAT_COUNT
+from storage import DEFAULT_FILES, CsvTable, JournaledCsvTable, SqliteTable, open_table
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+DTYPES = {
+    "payments": {"payment_id": str, "customer_username": "category", "flight_id": "category",
+                 "amount": "float64", "date": str, "ref": str},
+    "bookings": {"booking_id": str, "customer_username": "category", "flight_id": "category",
+                 "seat_no": "category", "date": str},
+    "flights": {"flight_id": str, "flight_number": str, "origin": "category", "destination": "category",
+                "price": "float64", "date": str, "departure_time": str, "duration": str, "airline": "category",
+                "seat_count": "float64"},
+}
+
+
+class ColumnStore:
+    # payments, bookings and flights loaded once as columnar frames and kept until a
+    # source table's stamp (mtime/size for csv) changes; every report is a vectorized groupby
+    def __init__(self, payments_file=DEFAULT_FILES["payments"], bookings_file=DEFAULT_FILES["bookings"],
+                 flights_file=DEFAULT_FILES["flights"], backend=None):
+        self.tables = {
+            "payments": open_table("payments", payments_file, backend=backend),
+            "bookings": open_table("bookings", bookings_file, backend=backend),
+            "flights": open_table("flights", flights_file, backend=backend),
+        }
+        self._frames = {}
+        self._stamps = {}
+        self._derived = {}  # (name, stamps) -> cached result
+        self._lock = threading.RLock()
+
+    def _read(self, name):
+        table = self.tables[name]
+        dtypes = DTYPES[name]
+        if isinstance(table, SqliteTable):
+            with table.db.lock:
+                frame = pd.read_sql_query(f"SELECT {', '.join(table.fieldnames)} FROM {name} ORDER BY rowid",
+                                          table.db.conn)
+            frame = frame.astype(dtypes)
+        elif isinstance(table, CsvTable):
+            frame = self._read_csv(table.path, table.fieldnames, dtypes)
+            if isinstance(table, JournaledCsvTable):
+                frame = self._replay_journal(table, frame, dtypes)
+        else:
+            frame = pd.DataFrame(table.load(), columns=table.fieldnames).astype(dtypes)
+        if "date" in frame and name != "flights":
+            frame["date"] = pd.to_datetime(frame["date"], format=DATE_FORMAT, errors="coerce")
+        return frame
+
+    def _read_csv(self, path, columns, dtypes):
+        try:
+            frame = pd.read_csv(path, dtype=dtypes, usecols=lambda c: c in columns)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return pd.DataFrame({c: pd.Series(dtype=dtypes[c]) for c in columns})
+        for c in columns:
+            if c not in frame:
+                frame[c] = pd.Series(dtype=dtypes[c], index=frame.index)  # file written before the column existed
+        return frame
+
+    def _replay_journal(self, table, snapshot, dtypes):
+        # the journal is an ordered log of add / update / delete; the last entry per key wins
+        journal = self._read_csv(table.journal_path, ["op"] + table.fieldnames, dict(dtypes, op=str))
+        if journal.empty:
+            return snapshot
+        journal = journal.dropna(subset=["op"])
+        log = pd.concat([snapshot.assign(op="add"), journal], ignore_index=True)
+        log = log.drop_duplicates(subset=[table.key], keep="last")
+        return log[log["op"] != "delete"].drop(columns="op").astype(dtypes).reset_index(drop=True)
+
+    def frame(self, name):
+        with self._lock:
+            stamp = self.tables[name].stamp()
+            if name not in self._frames or self._stamps.get(name) != stamp:
+                self._frames[name] = self._read(name)
+                self._stamps[name] = stamp
+            return self._frames[name]
+
+    def _cached(self, key, sources, compute):
+        with self._lock:
+            frames = [self.frame(s) for s in sources]
+            cache_key = (key, tuple(repr(self._stamps[s]) for s in sources))
+            if cache_key not in self._derived:
+                self._derived = {k: v for k, v in self._derived.items() if k[0] != key}
+                self._derived[cache_key] = compute(*frames)
+            return self._derived[cache_key]
+
+    def _payments_with_flights(self):
+        def compute(payments, flights):
+            joined = payments.merge(flights[["flight_id", "origin", "destination", "airline"]],
+                                    on="flight_id", how="left")
+            for column in ("origin", "destination", "airline"):
+                # payments for flights that no longer exist are still revenue
+                joined[column] = joined[column].astype(object).fillna("Unknown")
+            return joined
+        return self._cached("payments_with_flights", ("payments", "flights"), compute)
+
+    def revenue_by_route(self):
+        def compute(payments, flights):
+            joined = self._payments_with_flights()
+            return (joined.groupby(["origin", "destination"], observed=True)["amount"]
+                    .sum().sort_values(ascending=False).rename("revenue").reset_index())
+        return self._cached("revenue_by_route", ("payments", "flights"), compute)
+
+    def revenue_by_airline(self):
+        def compute(payments, flights):
+            joined = self._payments_with_flights()
+            return (joined.groupby("airline", observed=True)["amount"]
+                    .sum().sort_values(ascending=False).rename("revenue").reset_index())
+        return self._cached("revenue_by_airline", ("payments", "flights"), compute)
+
+    def revenue_by_day(self):
+        def compute(payments):
+            return (payments.groupby(payments["date"].dt.normalize())["amount"]
+                    .sum().rename("revenue").rename_axis("day").reset_index())
+        return self._cached("revenue_by_day", ("payments",), compute)
+
+    def load_factor(self):
+        # booked seats over each flight's own seat_count (flights stored without one have the default)
+        def compute(bookings, flights):
+            counts = bookings["flight_id"].astype(str).value_counts()
+            booked = counts.reindex(flights["flight_id"]).fillna(0).to_numpy(dtype=np.int64)
+            seats = flights["seat_count"].fillna(DEFAULT_SEAT_COUNT).clip(lower=1).to_numpy(dtype=np.float64)
+            return pd.DataFrame({
+                "flight_id": flights["flight_id"].to_numpy(),
+                "flight_number": flights["flight_number"].to_numpy(),
+                "booked": booked,
+                "load_factor": np.minimum(booked / seats, 1.0),
+            }).sort_values("load_factor", ascending=False, ignore_index=True)
+        return self._cached("load_factor", ("bookings", "flights"), compute)
+
+    def top_customers(self, n=10):
+        def compute(payments):
+            grouped = payments.groupby("customer_username", observed=True)["amount"]
+            return (pd.DataFrame({"spent": grouped.sum(), "payments": grouped.size()})
+                    .nlargest(n, "spent").rename_axis("customer").reset_index())
+        return self._cached(f"top_customers:{n}", ("payments",), compute)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_column_store():
+    # one column store per process, shared by every admin session
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ColumnStore()
+    return _store
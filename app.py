@@ -1,37 +1,24 @@
+import time
+import uuid
 import streamlit as st
 import pandas as pd
-import csv
 from datetime import datetime
 
-from admin import AdminManager
 from customer import Customer
-from flight import FlightManager, Flight
-from booking import BookingManager
-from ticket import TicketSystem
-from payment import PaymentManager
-from report import ReportManager
-
-manager = AdminManager()
-manager.add_admin("admin", "adminpass", "Primary Admin")
-
-def get_existing_users():
-    """Returns a list of dictionaries containing all registered users."""
-    users = []
-    try:
-        with open("users.csv", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                users.append(row)
-    except FileNotFoundError:
-        pass
-    return users
+from flight import Flight
+from seating import POSITIONS, seat_label
+from services import get_services
+from analytics import get_column_store
+import metrics
+from archive import archive_departed
+from ledger import OPENING_BALANCE
+
+run_started = time.perf_counter()
+
+# every session shares the process-wide managers; each one loads on first use
+services = get_services()
 
 if 'initialized' not in st.session_state:
-    st.session_state.flight_mgr = FlightManager()
-    st.session_state.admin_mgr = AdminManager()
-    st.session_state.booking_mgr = BookingManager()
-    st.session_state.payment_mgr = PaymentManager()
-    st.session_state.ticket_sys = TicketSystem(st.session_state.booking_mgr, st.session_state.flight_mgr)
     st.session_state.user = None
     st.session_state.role = None 
     st.session_state.initialized = True
@@ -94,7 +81,7 @@ with st.sidebar:
         with col1:
             if st.button("Login", use_container_width=True):
                 if login_type == "Administrator":
-                    res = st.session_state.admin_mgr.login(email_input, password_input)
+                    res = services.admin_mgr.login(email_input, password_input)
                     if res:
                         st.session_state.user = res
                         st.session_state.role = "admin"
@@ -108,8 +95,9 @@ with st.sidebar:
                     if res:
                         st.session_state.user = res
                         st.session_state.role = "customer"
-                        if not hasattr(st.session_state.user, 'wallet'):
-                            st.session_state.user.wallet = 10000.0 
+                        st.session_state.user.username = st.session_state.user.email
+                        # the balance persists in the ledger; only a first login gets the opening balance
+                        services.payment_mgr.open_account(st.session_state.user, OPENING_BALANCE)
                         st.rerun()
                     else:
                         st.error("Authentication failed: User not found or incorrect password.")
@@ -120,13 +108,9 @@ with st.sidebar:
                     if not user_name or not email_input or not password_input:
                         st.warning("All fields are required for registration.")
                     else:
-                        existing_users = get_existing_users()
-                        name_exists = any(u['name'].lower() == user_name.lower() for u in existing_users)
-                        email_exists = any(u['email'].lower() == email_input.lower() for u in existing_users)
-                        
-                        if name_exists:
+                        if Customer.name_exists(user_name):
                             st.error("Registration Error: This name is already registered.")
-                        elif email_exists:
+                        elif Customer.email_exists(email_input):
                             st.error("Registration Error: This email address is already in use.")
                         else:
                             Customer.register(user_name, email_input, password_input)
@@ -143,11 +127,11 @@ if st.session_state.user is None:
 
 elif st.session_state.role == "admin":
     st.subheader("Administrative Control Panel")
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Reports", "Active Flights", "Add Flight", "Modify Flight", "Bookings","Delete Flight"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(["Reports", "Active Flights", "Add Flight", "Modify Flight", "Bookings","Delete Flight", "Analytics", "Performance"])
     
     with tab1:
         st.markdown("#### System Statistics")
-        rep = ReportManager(flight_manager=st.session_state.flight_mgr, booking_manager=st.session_state.booking_mgr)
+        rep = services.report_mgr
         
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Registered Customers", rep.load_customers_count())
@@ -155,9 +139,29 @@ elif st.session_state.role == "admin":
         c3.metric("Available Flights", rep.flights_count())
         c4.metric("Active Bookings", rep.bookings_count())
 
+        if st.button("Verify Counters", key="verify_counters"):
+            problems = rep.verify()
+            if problems:
+                rep.recompute()
+                st.warning(f"{len(problems)} counters had drifted and were recomputed.")
+            else:
+                st.success("Counters match the underlying data.")
+
+        with st.expander("Archived History"):
+            st.caption("Departed flights and their bookings and payments, kept in monthly partitions")
+            if st.button("Archive Departed Flights", key="archive_departed"):
+                counts = archive_departed(services.flight_mgr, services.booking_mgr, services.payment_mgr)
+                st.success(f"Archived {counts['flights']} flights, {counts['bookings']} bookings "
+                           f"and {counts['payments']} payments.")
+            summary = rep.archive_summary()
+            if summary:
+                st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+            else:
+                st.write("Nothing archived yet.")
+
     with tab2:
         st.markdown("#### Active Flight List")
-        flights = st.session_state.flight_mgr.flights
+        flights = services.flight_mgr.flights
         if flights:
             for f_id, f in flights.items():
                 with st.expander(f"Flight {f.flight_number}: {f.origin} to {f.destination}"):
@@ -189,12 +193,12 @@ elif st.session_state.role == "admin":
             if st.form_submit_button("Submit to Registry"):
                 new_f = Flight(f_num, f_org, f_dest, f_price, str(f_date), str(f_time), f_dur, f_air)
                 st.session_state.user.role = "admin"
-                st.session_state.flight_mgr.add_flight(st.session_state.user, new_f)
+                services.flight_mgr.add_flight(st.session_state.user, new_f)
                 st.success("New flight entry successfully recorded.")
 
     with tab4:
         st.markdown("#### Modify Existing Records")
-        flights = st.session_state.flight_mgr.flights
+        flights = services.flight_mgr.flights
         if flights:
             target = st.selectbox("Select Flight ID", options=list(flights.keys()), format_func=lambda x: flights[x].flight_number)
             f = flights[target]
@@ -205,7 +209,7 @@ elif st.session_state.role == "admin":
                 n_dest = st.text_input("Update Destination", value=f.destination)
                 if st.form_submit_button("Apply Updates"):
                     st.session_state.user.role = "admin"
-                    st.session_state.flight_mgr.edit_flight(st.session_state.user, target, price=n_price, duration=n_dur, origin=n_orig, destination=n_dest)
+                    services.flight_mgr.edit_flight(st.session_state.user, target, price=n_price, duration=n_dur, origin=n_orig, destination=n_dest)
                     st.success("Record updated.")
                     st.rerun()
         else:
@@ -214,7 +218,7 @@ elif st.session_state.role == "admin":
     with tab5:
         st.markdown("#### Booking Registry Management")
     
-        if not st.session_state.booking_mgr.bookings:
+        if not services.booking_mgr.bookings:
             st.info("No booking records available.")
         else:
             # Column headers for the "Labels" look
@@ -225,7 +229,7 @@ elif st.session_state.role == "admin":
             h4.caption("ACTIONS")
             st.divider()
 
-            for b in st.session_state.booking_mgr.bookings:
+            for b in services.booking_mgr.bookings:
                 cols = st.columns([1, 2, 1, 1])
                 with cols[0]:
                     st.markdown(f"`{b.booking_id}`")
@@ -236,16 +240,15 @@ elif st.session_state.role == "admin":
                 with cols[3]:
                     # Unique key fixed to avoid DuplicateWidgetID
                     if st.button("Cancel", key=f"cancel_bk_{b.booking_id}", type="secondary", use_container_width=True):
-                        # Add your cancellation logic here if needed
-                        st.session_state.booking_mgr.bookings.remove(b)
-                        st.session_state.booking_mgr.save_bookings()
+                        services.waitlist  # loaded first so the freed seat goes to the next waitlisted customer
+                        services.booking_mgr.cancel_booking(b.booking_id, services.flight_mgr, services.payment_mgr)
                         st.success(f"Booking {b.booking_id} has been cancelled.")
 
                 st.divider()
         
     with tab6:
         st.markdown("### Terminate Flight Registry")
-        active_flights = st.session_state.flight_mgr.flights
+        active_flights = services.flight_mgr.flights
     
         if not active_flights:
             st.info("No records available for deletion.")
@@ -264,70 +267,205 @@ elif st.session_state.role == "admin":
                         if st.button("Delete Record", key=f"tab6_del_{f_id}", type="primary", use_container_width=True):
                             if not hasattr(st.session_state.user, 'role'):
                                 st.session_state.user.role = "admin"
-                            success = st.session_state.flight_mgr.delete_flight(st.session_state.user, f_id)
+                            success = services.flight_mgr.delete_flight(st.session_state.user, f_id)
                             if success:
+                                services.booking_mgr.cancel_flight(f_id, services.payment_mgr)
                                 st.success(f"Flight {f.flight_number} removed.")
                                 st.rerun()
                             else:
                                 st.error("Failed to delete.")
 
+    with tab7:
+        st.markdown("#### Revenue & Load Analytics")
+        store = get_column_store()
+
+        a1, a2 = st.columns(2)
+        with a1:
+            st.caption("REVENUE BY ROUTE")
+            st.dataframe(store.revenue_by_route(), hide_index=True, use_container_width=True)
+        with a2:
+            st.caption("REVENUE BY AIRLINE")
+            st.dataframe(store.revenue_by_airline(), hide_index=True, use_container_width=True)
+
+        st.caption("REVENUE BY DAY")
+        st.line_chart(store.revenue_by_day(), x="day", y="revenue")
+
+        a3, a4 = st.columns(2)
+        with a3:
+            st.caption("LOAD FACTOR PER FLIGHT")
+            st.dataframe(store.load_factor().head(50), hide_index=True, use_container_width=True)
+        with a4:
+            st.caption("TOP CUSTOMERS")
+            st.dataframe(store.top_customers(10), hide_index=True, use_container_width=True)
+
+    with tab8:
+        st.markdown("#### Performance")
+        s1, s2 = st.columns(2)
+        s1.metric("Previous Page Run", f"{st.session_state.get('last_run_ms', 0):,.1f} ms")
+        s2.metric("Managers Loaded", len(services.timings))
+        st.caption("FIRST LOAD PER MANAGER (ms, includes anything it loaded first)")
+        st.dataframe(pd.DataFrame([{"manager": name, "ms": round(seconds * 1000, 2)}
+                                   for name, seconds in services.timings.items()]),
+                     hide_index=True, use_container_width=True)
+
+        enabled = st.toggle("Collect metrics", value=metrics.ENABLED, key="metrics_enabled")
+        if enabled != metrics.ENABLED:
+            metrics.enable() if enabled else metrics.disable()
+
+        if not metrics.ENABLED:
+            st.info("Metrics are off. Turn them on here or start the app with AIRLINE_METRICS=1.")
+        else:
+            data = metrics.snapshot()
+            p1, p2 = st.columns([4, 1])
+            p1.caption("MANAGER CALLS (slowest total first)")
+            if p2.button("Reset", key="metrics_reset", use_container_width=True):
+                metrics.reset()
+                st.rerun()
+            st.dataframe(pd.DataFrame(data["calls"]), hide_index=True, use_container_width=True)
+            st.caption("STORAGE (loads, saves and appends per table)")
+            st.dataframe(pd.DataFrame(data["storage"]), hide_index=True, use_container_width=True)
+            st.download_button("Download Prometheus metrics", metrics.prometheus_text(),
+                               file_name="metrics.txt", mime="text/plain")
+
 elif st.session_state.role == "customer":
     st.subheader(f"Welcome {st.session_state.user.name}.")
     tab1, tab2, tab3 = st.tabs(["Flight Search", "My Reservations", "Financial History"])
     
-    user_booked_ids = [
-        b.flight_id for b in st.session_state.booking_mgr.bookings 
-        if b.customer_username == st.session_state.user.email
-    ]
+    my_bookings = services.booking_mgr.bookings_for_customer(st.session_state.user.email)
+    user_booked_ids = {b.flight_id for b in my_bookings}
     
     with tab1:
         st.markdown("#### Available Flight Schedules")
-        for f_id, f in st.session_state.flight_mgr.flights.items():
+        s1, s2, s3, s4 = st.columns(4)
+        q_origin = s1.text_input("From", key="search_origin")
+        q_dest = s2.text_input("To", key="search_destination")
+        q_dates = s3.date_input("Travel Dates", value=(), key="search_dates")
+        q_sort = s4.selectbox("Sort By", ["departure", "price"], format_func=str.title, key="search_sort")
+        q_page = st.session_state.get("search_page", 1)
+        b1, b2 = st.columns(2)
+        q_position = b1.selectbox("Seat Preference", list(POSITIONS), format_func=str.title, key="seat_position")
+        q_party = int(b2.number_input("Passengers", min_value=1, max_value=9, value=1, key="seat_party"))
+
+        results = services.flight_mgr.search(
+            origin=q_origin or None,
+            destination=q_dest or None,
+            date_from=q_dates[0] if len(q_dates) > 0 else None,
+            date_to=q_dates[-1] if len(q_dates) > 0 else None,
+            sort_by=q_sort,
+            page=q_page,
+            page_size=10,
+        )
+        if results.total and q_page > results.pages:
+            st.session_state.search_page = 1
+            st.rerun()
+
+        fares = services.pricing.quotes([f.flight_id for f in results])
+        for f in results:
+            f_id = f.flight_id
+            fare = fares.get(f_id, f.price)
             with st.container(border=True):
                 c1, c2, c3 = st.columns([3, 1, 1])
                 c1.write(f"**{f.origin} to {f.destination}** ({f.airline})")
-                c2.write(f"Price: ${f.price}")
+                c2.write(f"Price: ${fare:,.2f}")
                 
                 is_booked = f_id in user_booked_ids
                 
                 if is_booked:
                     c3.button("Already Booked", key=f"btn_{f_id}", disabled=True)
+                elif not f.seats.free_count():
+                    if c3.button("Join Waitlist", key=f"cust_wl_{f_id}"):
+                        if not hasattr(st.session_state.user, 'username'):
+                            st.session_state.user.username = st.session_state.user.email
+                        if services.waitlist.join(st.session_state.user, f_id):
+                            st.success("Added to the waitlist.")
+                            st.rerun()
+                        else:
+                            st.error("The waitlist for this flight is full.")
                 else:
                     if c3.button("Confirm Booking", key=f"cust_bk_{f_id}"):
                         if not hasattr(st.session_state.user, 'username'):
                             st.session_state.user.username = st.session_state.user.email
                         
-                        if st.session_state.payment_mgr.make_payment(st.session_state.user, f):
-                            st.session_state.booking_mgr.create_booking(
-                                st.session_state.user.email, 
-                                st.session_state.flight_mgr, 
-                                f_id, 
-                                "S1"
-                            )
+                        # one token per purchase: a double click or rerun replays it instead of charging again
+                        token = st.session_state.setdefault("checkout_token", str(uuid.uuid4()))
+                        receipt = services.checkout.checkout(
+                            st.session_state.user,
+                            f_id,
+                            count=q_party,
+                            position=q_position,
+                            key=f"{token}:{f_id}"
+                        )
+                        if receipt:
+                            del st.session_state["checkout_token"]
                             st.success("Reservation confirmed.")
                             st.rerun()
-                        else:
+                        elif services.payment_mgr.balance(st.session_state.user) < fare * q_party:
                             st.error("Insufficient funds.")
-        else:
+                        else:
+                            st.error("Not enough seats left on this flight.")
+
+        if not results.total:
             st.warning("No flights available for booking.")
+        else:
+            p1, p2, p3 = st.columns([1, 2, 1])
+            if p1.button("Previous", disabled=results.page <= 1, key="search_prev"):
+                st.session_state.search_page = results.page - 1
+                st.rerun()
+            p2.caption(f"Page {results.page} of {results.pages} ({results.total} flights)")
+            if p3.button("Next", disabled=not results.has_next, key="search_next"):
+                st.session_state.search_page = results.page + 1
+                st.rerun()
 
     with tab2:
         st.markdown("#### Active Boarding Passes")
         has_bookings = False
-        for b in st.session_state.booking_mgr.bookings:
-            if b.customer_username == st.session_state.user.email:
-                f = st.session_state.flight_mgr.flights.get(b.flight_id)
-                if f:
-                    with st.expander(f"Booking ID: {b.booking_id} | Flight: {f.flight_number}"):
-                        st.write(f"**Route:** {f.origin} ➝ {f.destination}")
-                        st.write(f"**Date:** {f.date} | **Time:** {f.duration}")
-                        st.write(f"**Seat Number:** {b.seat_no}")
-                        st.write(f"**Price Paid:** ${f.price}")
-                has_bookings = True
+        for b in my_bookings:
+            f = services.flight_mgr.flights.get(b.flight_id)
+            if f:
+                with st.expander(f"Booking ID: {b.booking_id} | Flight: {f.flight_number}"):
+                    st.write(f"**Route:** {f.origin} ➝ {f.destination}")
+                    st.write(f"**Date:** {f.date} | **Time:** {f.duration}")
+                    st.write(f"**Seat Number:** {seat_label(b.seat_no)} ({b.seat_no})")
+                    paid = services.payment_mgr.paid_for(b.booking_id)
+                    st.write(f"**Price Paid:** ${paid:,.2f}" if paid else f"**Base Fare:** ${f.price}")
+            has_bookings = True
         st.warning("Note: Contact the airline for any changes.")
         if not has_bookings:
             st.write("No active reservations found.")
 
+        my_waitlist = services.waitlist.for_customer(st.session_state.user.email)
+        if my_waitlist:
+            st.markdown("#### Waitlist")
+            for e in my_waitlist:
+                f = services.flight_mgr.flights.get(e.flight_id)
+                w1, w2 = st.columns([3, 1])
+                w1.write(f"**{f.flight_number if f else e.flight_id}** | position {services.waitlist.position(e.entry_id)}")
+                if w2.button("Leave", key=f"wl_leave_{e.entry_id}"):
+                    services.waitlist.leave(e.entry_id)
+                    st.rerun()
+
     with tab3:
         st.markdown("#### Wallet Balance")
-        st.metric("Available Funds", f"${st.session_state.user.wallet:,.2f}")
\ No newline at end of file
+        st.metric("Available Funds", f"${services.payment_mgr.balance(st.session_state.user):,.2f}")
+
+        st.markdown("#### Transactions")
+        history = services.payment_mgr.history(st.session_state.user.email,
+                                               page=st.session_state.get("history_page", 1))
+        if not history.total:
+            st.write("No transactions yet.")
+        else:
+            st.dataframe(pd.DataFrame([
+                {"Date": p.date, "Flight": p.flight_id, "Amount": p.amount,
+                 "Type": "Refund" if p.amount < 0 else "Payment"}
+                for p in history
+            ]), hide_index=True, use_container_width=True)
+            h1, h2, h3 = st.columns([1, 2, 1])
+            if h1.button("Newer", disabled=history.page <= 1, key="history_prev"):
+                st.session_state.history_page = history.page - 1
+                st.rerun()
+            h2.caption(f"Page {history.page} of {history.pages} ({history.total} transactions)")
+            if h3.button("Older", disabled=not history.has_next, key="history_next"):
+                st.session_state.history_page = history.page + 1
+                st.rerun()
+
+st.session_state.last_run_ms = (time.perf_counter() - run_started) * 1000
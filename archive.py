@@ -0,0 +1,188 @@
+import argparse
+import os
+import sys
+import threading
+from contextlib import ExitStack
+from datetime import date
+
+from booking import BookingManager
+from flight import FlightManager
+from payment import PaymentManager
+from storage import CsvTable
+
+ARCHIVE_DIR = "archive"
+ARCHIVED_TABLES = ("flights", "bookings", "payments")
+
+# archive/<table>/<YYYY-MM>.csv holds the records of flights that departed in that month.
+# bookings and payments follow their flight; ones whose flight is gone go by their own date
+
+
+def partition_path(archive_dir, table, month):
+    return os.path.join(archive_dir, table, f"{month}.csv")
+
+
+def _month(value):
+    # "YYYY-MM" from a "YYYY-MM-DD..." string, None when it doesn't look like a date
+    value = str(value)
+    if len(value) >= 7 and value[:4].isdigit() and value[4] == "-" and value[5:7].isdigit():
+        return value[:7]
+    return None
+
+
+def _append(archive_dir, table, month, rows):
+    # skips rows already in the partition, so an archive run interrupted after this step can be repeated
+    partition = CsvTable(table, partition_path(archive_dir, table, month))
+    os.makedirs(os.path.dirname(partition.path), exist_ok=True)
+    key = partition.key
+    archived = {row[key] for row in partition.load()}
+    new_rows = [row for row in rows if str(row[key]) not in archived]
+    if new_rows:
+        partition.insert_many(new_rows)
+    return len(new_rows)
+
+
+def archive_departed(flight_manager: FlightManager, booking_manager: BookingManager,
+                     payment_manager: PaymentManager, before=None, archive_dir=ARCHIVE_DIR):
+    # moves flights dated before `before` (default today), with their bookings and payments, into
+    # monthly partitions, then drops them from the managers and rewrites the live tables.
+    # live flights keep their Flight objects and seat maps. returns {table: rows archived}
+    before = str(before or date.today().isoformat())
+    counts = dict.fromkeys(ARCHIVED_TABLES, 0)
+    removed = []
+    with ExitStack() as stack:
+        for manager in (flight_manager, booking_manager, payment_manager):
+            stack.enter_context(manager._lock)
+
+        departed = {fid: _month(f.date) for fid, f in flight_manager.flights.items()
+                    if _month(f.date) and str(f.date) < before}
+
+        def split(records, row, own_date):
+            live, archived = [], {}
+            for record in records:
+                if record.flight_id in departed:
+                    month = departed[record.flight_id]
+                elif record.flight_id not in flight_manager.flights and _month(own_date(record)) \
+                        and str(own_date(record)) < before:
+                    month = _month(own_date(record))
+                else:
+                    live.append(record)
+                    continue
+                archived.setdefault(month, []).append(row(record))
+            return live, archived
+
+        flights_by_month = {}
+        for fid, month in departed.items():
+            flights_by_month.setdefault(month, []).append(flight_manager._row(flight_manager.flights[fid]))
+        live_bookings, bookings_by_month = split(booking_manager.bookings, booking_manager._row, lambda b: b.date)
+        live_payments, payments_by_month = split(payment_manager.payments, payment_manager._row, lambda p: p.date)
+
+        # partitions first: a crash before the live tables are rewritten leaves rows in both places,
+        # and the next run only drops them from the live side
+        for table, by_month in (("flights", flights_by_month), ("bookings", bookings_by_month),
+                                ("payments", payments_by_month)):
+            for month, rows in by_month.items():
+                _append(archive_dir, table, month, rows)
+                counts[table] += len(rows)
+
+        if counts["flights"]:
+            removed = [flight_manager.flights[fid] for fid in departed]
+            flight_manager.flights = {fid: f for fid, f in flight_manager.flights.items() if fid not in departed}
+            flight_manager._rebuild_search_index()
+            flight_manager.table.save()
+            flight_manager._emit("load")
+        if counts["bookings"]:
+            booking_manager.bookings = live_bookings
+            booking_manager._reindex()
+            booking_manager.table.save()
+            booking_manager._emit("load")
+        if counts["payments"]:
+            payment_manager.payments = live_payments
+            payment_manager._reindex()
+            payment_manager.table.save()
+            payment_manager._emit("load")
+    # a "delete" per archived flight, as delete_flight sends, so the waitlist drops their entries;
+    # sent once the manager locks are released since listeners take their own locks
+    for flight in removed:
+        flight_manager._emit("delete", flight)
+    return counts
+
+
+class ArchiveReader:
+    # read-only, on-demand access to the monthly partitions; each partition is parsed on first use
+    # and kept until its file changes
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self._cache = {}  # path -> (stamp, rows)
+        self._lock = threading.Lock()
+
+    def months(self, table):
+        try:
+            names = os.listdir(os.path.join(self.archive_dir, table))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith(".csv") and _month(name))
+
+    def load(self, table, month):
+        partition = CsvTable(table, partition_path(self.archive_dir, table, month))
+        stamp = partition.stamp()
+        with self._lock:
+            cached = self._cache.get(partition.path)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        rows = partition.load()
+        with self._lock:
+            self._cache[partition.path] = (stamp, rows)
+        return rows
+
+    def rows(self, table, from_month=None, to_month=None):
+        # every archived row of `table` in the inclusive "YYYY-MM" range, oldest partition first
+        for month in self.months(table):
+            if (from_month and month < from_month) or (to_month and month > to_month):
+                continue
+            yield from self.load(table, month)
+
+    def bookings_for_customer(self, customer_username, from_month=None, to_month=None):
+        return [row for row in self.rows("bookings", from_month, to_month)
+                if row["customer_username"] == customer_username]
+
+    def payments_for_customer(self, customer_username, from_month=None, to_month=None):
+        return [row for row in self.rows("payments", from_month, to_month)
+                if row["customer_username"] == customer_username]
+
+    def summary(self, from_month=None, to_month=None):
+        # one entry per archived month: flights, bookings and revenue
+        months = {}
+        for table in ARCHIVED_TABLES:
+            for month in self.months(table):
+                if (from_month and month < from_month) or (to_month and month > to_month):
+                    continue
+                entry = months.setdefault(month, {"month": month, "flights": 0, "bookings": 0, "revenue": 0.0})
+                rows = self.load(table, month)
+                if table == "payments":
+                    entry["revenue"] += sum(float(row["amount"] or 0) for row in rows)
+                else:
+                    entry[table] += len(rows)
+        return [months[m] for m in sorted(months)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move departed flights and their bookings / payments "
+                                                 "into monthly archive partitions")
+    parser.add_argument("--before", default=date.today().isoformat(),
+                        help="archive flights dated before this day (YYYY-MM-DD), default today")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--flights-file", default="flights.csv")
+    parser.add_argument("--bookings-file", default="bookings.csv")
+    parser.add_argument("--payments-file", default="payments.csv")
+    args = parser.parse_args(argv)
+
+    flight_mgr = FlightManager(args.flights_file)
+    booking_mgr = BookingManager(args.bookings_file)
+    payment_mgr = PaymentManager(args.payments_file)
+    counts = archive_departed(flight_mgr, booking_mgr, payment_mgr, args.before, args.archive_dir)
+    print(", ".join(f"{count} {table}" for table, count in counts.items()) + f" archived to {args.archive_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
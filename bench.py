@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import datagen
+from booking import BookingManager
+from customer import Customer
+from flight import FlightManager
+from payment import PaymentManager
+from report import ReportManager
+from services import Services
+from ticket import TicketSystem
+
+DEFAULT_SIZES = [1000, 10000, 100000]  # bookings per run; the other tables scale from it
+OPS = 200  # repetitions for the per-operation benchmarks
+
+
+def dataset_for(size):
+    return {
+        "flights": max(10, size // 50),
+        "bookings": size,
+        "users": max(10, size // 10),
+        "payments": size,
+    }
+
+
+def _measure(fn, memory=False):
+    # wall time of one call, plus peak traced allocation from a second, traced call when asked
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - started
+        peak = None
+        if memory:
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_size(size, workdir, seed=0):
+    counts = dataset_for(size)
+    datagen.generate(workdir, seed=seed, **counts)
+    paths = {name: os.path.join(workdir, f"{name}.csv") for name in ("flights", "bookings", "users", "payments",
+                                                                     "admins")}
+    rng = random.Random(seed)
+    results = []
+
+    def record(name, seconds, ops=1, peak=None):
+        results.append({
+            "size": size,
+            "name": name,
+            "ops": ops,
+            "seconds": round(seconds, 6),
+            "per_op_ms": round(seconds * 1000 / ops, 4),
+            "peak_kb": round(peak / 1024, 1) if peak is not None else None,
+        })
+
+    # what a first page view pays: the login page needs only admins, a customer page the rest
+    _, seconds, _ = _measure(lambda: Services(workdir).admin_mgr)
+    record("startup_login_page", seconds)
+    _, seconds, _ = _measure(lambda: [getattr(Services(workdir), name) for name in
+                                      ("flight_mgr", "booking_mgr", "payment_mgr")])
+    record("startup_customer_page", seconds)
+
+    flight_mgr, seconds, peak = _measure(lambda: FlightManager(paths["flights"]), memory=True)
+    record("load_flights", seconds, peak=peak)
+    booking_mgr, seconds, peak = _measure(lambda: BookingManager(paths["bookings"]), memory=True)
+    record("load_bookings", seconds, peak=peak)
+    payment_mgr, seconds, peak = _measure(lambda: PaymentManager(paths["payments"]), memory=True)
+    record("load_payments", seconds, peak=peak)
+    # the loads above left binary snapshots behind (for tables big enough), so these are warm restarts
+    _, seconds, _ = _measure(lambda: BookingManager(paths["bookings"]))
+    record("load_bookings_warm", seconds)
+    _, seconds, _ = _measure(lambda: PaymentManager(paths["payments"]))
+    record("load_payments_warm", seconds)
+    _, seconds, _ = _measure(lambda: flight_mgr.restore_reservations(booking_mgr))
+    record("restore_reservations", seconds)
+
+    _, seconds, _ = _measure(flight_mgr.save_flights)
+    record("save_flights", seconds)
+    _, seconds, _ = _measure(booking_mgr.save_bookings)
+    record("save_bookings", seconds)
+    _, seconds, _ = _measure(payment_mgr.save_payments)
+    record("save_payments", seconds)
+
+    # bookings on random flights, each onto that flight's next free seat
+    flights = [f for f in flight_mgr.flights.values() if f.seats.free_count()]
+
+    def book():
+        made = 0
+        for _ in range(OPS):
+            flight = rng.choice(flights)
+            seat_no = flight.seats.next_free()
+            if seat_no and booking_mgr.create_booking("bench@example.com", flight_mgr, flight.flight_id, seat_no):
+                made += 1
+        return made
+    made, seconds, _ = _measure(book)
+    record("create_booking", seconds, ops=max(1, made))
+
+    saved_filename = Customer.FILENAME
+    Customer.FILENAME = paths["users"]
+    try:
+        emails = [f"user{rng.randrange(counts['users'])}@example.com" for _ in range(OPS)]
+        _, seconds, _ = _measure(lambda: Customer.login(emails[0], datagen.PASSWORD))
+        record("login_cold", seconds)
+        _, seconds, _ = _measure(lambda: [Customer.login(e, datagen.PASSWORD) for e in emails])
+        record("login", seconds, ops=OPS)
+    finally:
+        Customer.FILENAME = saved_filename
+
+    tickets = TicketSystem(booking_mgr, flight_mgr)
+    booking_ids = [b.booking_id for b in rng.sample(booking_mgr.bookings, min(OPS, len(booking_mgr.bookings)))]
+    _, seconds, _ = _measure(lambda: [tickets.print_ticket(i) for i in booking_ids])
+    record("ticket_lookup", seconds, ops=max(1, len(booking_ids)))
+
+    report, seconds, peak = _measure(lambda: ReportManager(paths["users"], paths["admins"], flight_mgr,
+                                                           booking_mgr, payment_mgr), memory=True)
+    record("report_build", seconds, peak=peak)
+    _, seconds, _ = _measure(report.generate_report)
+    record("report_generate", seconds)
+    _, seconds, _ = _measure(report.bookings_per_flight)
+    record("bookings_per_flight", seconds)
+    report.close()
+
+    return results
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    # prints per-benchmark ratios against an earlier results file (>1.00 means slower now)
+    before = {(r["size"], r["name"]): r for r in previous["results"]}
+    print(f"\nvs {previous.get('commit') or 'previous run'}:")
+    for r in current["results"]:
+        old = before.get((r["size"], r["name"]))
+        if old and old["per_op_ms"]:
+            ratio = r["per_op_ms"] / old["per_op_ms"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"  {r['size']:>8} {r['name']:<22} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the manager layer on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="bookings per run; flights, users and payments scale with it")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            size_results = run_size(size, workdir, args.seed)
+        results += size_results
+        for r in size_results:
+            peak = f"{r['peak_kb']:>10} KB" if r["peak_kb"] is not None else ""
+            print(f"{size:>8} {r['name']:<22} {r['per_op_ms']:>10.4f} ms/op {peak}")
+
+    output = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sizes": {size: dataset_for(size) for size in args.sizes},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
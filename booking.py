@@ -1,9 +1,14 @@
 import flight
-import csv
+import threading
 import uuid
 from datetime import datetime
 
+from events import EventSource
+from importer import ImportReport
+from storage import open_table, paused_gc
+
 BOOKINGS_FILE = "bookings.csv"
+COMPACT_TOMBSTONES = 1024  # cancelled slots tolerated before the list is packed (and at least half of it)
 
 class Booking:
     def __init__(self, customer_username: str, flight_id: str, seat_no: str):
@@ -13,37 +18,116 @@ class Booking:
         self.seat_no = seat_no
         self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-class BookingManager:
-    def __init__(self, file_path=BOOKINGS_FILE):
+    @classmethod
+    def from_row(cls, row):
+        # stored bookings already have an id and a date, so skip __init__'s uuid4 and clock read
+        b = cls.__new__(cls)
+        b.booking_id = row["booking_id"]
+        b.customer_username = row["customer_username"]
+        b.flight_id = row["flight_id"]
+        b.seat_no = row["seat_no"]
+        b.date = row["date"]
+        return b
+
+class BookingManager(EventSource):
+    # events: "load" (None), "add" and "cancel" (the Booking)
+    def __init__(self, file_path=BOOKINGS_FILE, backend=None):
         self.file_path = file_path#csv file that stores bookings deals with hard
-        self.bookings = []  # list of Booking نقدر نعمل عليها العمليات و بعدين نبقا نعدل في الcsv
+        self._lock = threading.RLock()  # guards the bookings, the indexes and the table
+        # with the csv backend new bookings and cancels are journaled, the csv itself is only rewritten on compaction
+        self.table = open_table("bookings", file_path, rows=self._rows, backend=backend, lock=self._lock)
+        # Booking objects in creation order; a cancel leaves a None tombstone so it never shifts the list
+        self._slots = []  # نقدر نعمل عليها العمليات و بعدين نبقا نعدل في الcsv
+        self._slot_of = {}  # booking_id -> position in _slots
+        self._tombstones = 0
+        # secondary indexes, kept in step with the live bookings on create / cancel / load
+        self._by_id = {}        # booking_id -> Booking
+        self._by_customer = {}  # customer_username -> {booking_id: Booking}
+        self._by_flight = {}    # flight_id -> {booking_id: Booking}
         self.load_bookings()
 
+    @property
+    def bookings(self):
+        # a fresh list of the live bookings
+        with self._lock:
+            if not self._tombstones:
+                return list(self._slots)
+            return [b for b in self._slots if b is not None]
+
+    @bookings.setter
+    def bookings(self, bookings):
+        with self._lock:
+            self._slots = list(bookings)
+            self._tombstones = 0
+            self._slot_of = {b.booking_id: i for i, b in enumerate(self._slots)}
+
+    def count(self):
+        return len(self._by_id)
+
     def load_bookings(self):
-        try:
-            with open(self.file_path, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    b = Booking(row["customer_username"], row["flight_id"], row["seat_no"])
-                    b.booking_id = row["booking_id"]
-                    b.date = row["date"]
-                    self.bookings.append(b)
-        except FileNotFoundError:
-            pass
+        with self._lock, paused_gc():
+            self.bookings = [Booking.from_row(row) for row in self.table.load()]
+            self._reindex()
+            self._emit("load")
+
+    def _reindex(self):
+        self._by_id, self._by_customer, self._by_flight = {}, {}, {}
+        for b in self._slots:
+            if b is not None:
+                self._index(b)
+
+    def _append(self, b):
+        self._slot_of[b.booking_id] = len(self._slots)
+        self._slots.append(b)
+        self._index(b)
+
+    def _remove(self, b):
+        # O(1): the slot becomes a tombstone, reclaimed by the next compaction
+        self._slots[self._slot_of.pop(b.booking_id)] = None
+        self._tombstones += 1
+        self._unindex(b)
+        if self._tombstones > COMPACT_TOMBSTONES and 2 * self._tombstones > len(self._slots):
+            self._compact_slots()
+
+    def _compact_slots(self):
+        self.bookings = [b for b in self._slots if b is not None]
+
+    def _index(self, b):
+        self._by_id[b.booking_id] = b
+        self._by_customer.setdefault(b.customer_username, {})[b.booking_id] = b
+        self._by_flight.setdefault(b.flight_id, {})[b.booking_id] = b
+
+    def _unindex(self, b):
+        self._by_id.pop(b.booking_id, None)
+        for index, key in ((self._by_customer, b.customer_username), (self._by_flight, b.flight_id)):
+            group = index.get(key)
+            if group is not None:
+                group.pop(b.booking_id, None)
+                if not group:
+                    del index[key]
+
+    def _row(self, b):
+        return {
+            "booking_id": b.booking_id,
+            "customer_username": b.customer_username,
+            "flight_id": b.flight_id,
+            "seat_no": b.seat_no,
+            "date": b.date
+        }
+
+    def _rows(self):
+        return [self._row(b) for b in self._slots if b is not None]
 
     def save_bookings(self):
-        with open(self.file_path, "w", newline="", encoding="utf-8") as f:#w delete all thing in csv for append the new data and last
-            fieldnames = ["booking_id", "customer_username", "flight_id", "seat_no", "date"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for b in self.bookings:
-                writer.writerow({
-                    "booking_id": b.booking_id,
-                    "customer_username": b.customer_username,
-                    "flight_id": b.flight_id,
-                    "seat_no": b.seat_no,
-                    "date": b.date
-                })
+        # full rewrite; for the csv backend this is the journal compaction
+        with self._lock:
+            self.table.save()
+
+    def compact(self):
+        # reclaims every tombstone, in memory and in the journal
+        with self._lock:
+            self._compact_slots()
+            self.table.save()
 
     def create_booking(self, customer_username, flight_manager, flight_id, seat_no):
         # التحقق من الرحلة
@@ -58,21 +142,183 @@ class BookingManager:
             print("Invalid seat number")
             return None
 
-        if flight.seats[seat_no].is_reserved:
-            print("Seat already reserved")
-            return None
-
-        # حجز المقعد
-        flight.seats[seat_no].is_reserved = True
+        with flight_manager.lock_for(flight_id):
+            # حجز المقعد
+            if not flight.seats.reserve(seat_no):
+                print("Seat already reserved")
+                return None
 
-        # إنشاء booking
-        booking = Booking(customer_username, flight_id, seat_no)
-        self.bookings.append(booking)
-        self.save_bookings()
+            # إنشاء booking
+            booking = Booking(customer_username, flight_id, seat_no)
+            with self._lock:
+                self._append(booking)
+                try:
+                    self.table.insert(self._row(booking))
+                except Exception:
+                    # nothing reached disk, so undo the reservation as well
+                    self._remove(booking)
+                    flight.seats.release(seat_no)
+                    raise
+                self._emit("add", booking)
         print(f"Booking successful for {customer_username} on seat {seat_no}")
         return booking
 
+    def book_reserved(self, customer_username, flight_id, seat_nos, booking_ids=None):
+        # records bookings for seats the caller already reserved under the flight lock (see seating.py);
+        # all of them are written together, and on a failed write none are kept.
+        # booking_ids: ids to use instead of fresh uuids (checkout derives them from its idempotency key)
+        bookings = [Booking(customer_username, flight_id, seat_no) for seat_no in seat_nos]
+        for booking, booking_id in zip(bookings, booking_ids or ()):
+            booking.booking_id = booking_id
+        with self._lock:
+            for booking in bookings:
+                self._append(booking)
+            try:
+                self.table.insert_many(self._row(b) for b in bookings)
+            except Exception:
+                for booking in bookings:
+                    self._remove(booking)
+                raise
+            for booking in bookings:
+                self._emit("add", booking)
+        print(f"Booking successful for {customer_username} on seats {', '.join(seat_nos)}")
+        return bookings
+
+    def bulk_create_bookings(self, rows, flight_manager):
+        # validates a stream of row dicts (customer_username, flight_id, seat_no and optionally
+        # booking_id / date), reserves their seats, rejects unknown flights, seat conflicts and
+        # duplicate ids, and stores every accepted booking with a single write.
+        # seats are reserved under each flight's lock before the booking lock is taken, the same
+        # flight-then-booking order as create_booking
+        report = ImportReport()
+        batch = []
+        with self._lock:
+            seen_ids = set(self._by_id)
+        for n, row in enumerate(rows, start=1):
+            if row is None:
+                report.reject(n, "malformed row")
+                continue
+            missing = [c for c in ("customer_username", "flight_id", "seat_no") if not row.get(c)]
+            if missing:
+                report.reject(n, f"missing {', '.join(missing)}")
+                continue
+            flight = flight_manager.flights.get(row["flight_id"])
+            if flight is None:
+                report.reject(n, f"flight {row['flight_id']} not found")
+                continue
+            if row["seat_no"] not in flight.seats:
+                report.reject(n, f"invalid seat number {row['seat_no']}")
+                continue
+            if row.get("booking_id") in seen_ids:
+                report.reject(n, f"duplicate booking_id {row['booking_id']}")
+                continue
+            with flight_manager.lock_for(flight.flight_id):
+                if not flight.seats.reserve(row["seat_no"]):
+                    report.reject(n, f"seat {row['seat_no']} already reserved on {flight.flight_number}")
+                    continue
+
+            booking = Booking(row["customer_username"], flight.flight_id, row["seat_no"])
+            if row.get("booking_id"):
+                booking.booking_id = row["booking_id"]
+            if row.get("date"):
+                booking.date = row["date"]
+            seen_ids.add(booking.booking_id)
+            batch.append((n, booking, flight))
+
+        released = []  # (booking, flight) whose seats go back once the booking lock is dropped
+        try:
+            with self._lock:
+                # an id may have been taken while the seats were being reserved
+                taken = [item for item in batch if item[1].booking_id in self._by_id]
+                for n, booking, flight in taken:
+                    report.reject(n, f"duplicate booking_id {booking.booking_id}")
+                    released.append((booking, flight))
+                batch = [item for item in batch if item[1].booking_id not in self._by_id]
+                if batch:
+                    # memory first, so a compaction triggered by the write already sees the batch
+                    for _, booking, _ in batch:
+                        self._append(booking)
+                    try:
+                        self.table.insert_many(self._row(b) for _, b, _ in batch)
+                    except Exception:
+                        for _, booking, flight in batch:
+                            self._remove(booking)
+                            released.append((booking, flight))
+                        raise
+                    for _, booking, _ in batch:
+                        self._emit("add", booking)
+                report.added = len(batch)
+        finally:
+            for booking, flight in released:
+                with flight_manager.lock_for(flight.flight_id):
+                    flight.seats.release(booking.seat_no)
+
+        print(f"Bulk import: {report.added} bookings added, {len(report.errors)} rejected")
+        return report
+
     def list_bookings(self, customer_username=None):
-        for b in self.bookings:
-            if customer_username is None or b.customer_username == customer_username:
-                print(f"BookingID: {b.booking_id} | FlightID: {b.flight_id} | Seat: {b.seat_no} | Date: {b.date}")
+        bookings = self.bookings if customer_username is None else self.bookings_for_customer(customer_username)
+        for b in bookings:
+            print(f"BookingID: {b.booking_id} | FlightID: {b.flight_id} | Seat: {b.seat_no} | Date: {b.date}")
+
+    def cancel_booking(self, booking_id, flight_manager=None, payment_manager=None, customer=None):
+        # tombstones the booking, frees its seat (given the flight manager) and refunds what was
+        # paid for it (given the payment manager; customer is the logged-in Customer to credit)
+        with self._lock:
+            booking = self._by_id.get(booking_id)
+            if not booking:
+                print("Booking not found")
+                return None
+            # memory first, so a compaction triggered by the write already leaves it out
+            self._remove(booking)
+            try:
+                self.table.delete(booking.booking_id)
+            except Exception:
+                self._append(booking)  # still on disk, so still booked
+                raise
+        if flight_manager and booking.flight_id in flight_manager.flights:
+            with flight_manager.lock_for(booking.flight_id):
+                flight_manager.flights[booking.flight_id].seats.release(booking.seat_no)
+        if payment_manager:
+            payment_manager.refund(booking, customer)
+        # emitted once the seat is free again and no lock is held, so a listener (the waitlist)
+        # can book it straight away
+        self._emit("cancel", booking)
+        print(f"Booking {booking_id} cancelled")
+        return booking
+
+    def cancel_flight(self, flight_id, payment_manager=None):
+        # cancels every booking on a flight with one write, e.g. once the flight is deleted;
+        # no seats are released since the flight is going away
+        with self._lock:
+            bookings = list(self._by_flight.get(flight_id, {}).values())
+            if not bookings:
+                return []
+            for booking in bookings:
+                self._remove(booking)
+            try:
+                self.table.delete_many(b.booking_id for b in bookings)
+            except Exception:
+                for booking in bookings:
+                    self._append(booking)
+                raise
+        if payment_manager:
+            payment_manager.refund_many(bookings)
+        for booking in bookings:
+            self._emit("cancel", booking)
+        print(f"{len(bookings)} bookings cancelled on flight {flight_id}")
+        return bookings
+
+    def get_booking(self, booking_id):
+        return self._by_id.get(booking_id)
+
+    def bookings_for_customer(self, customer_username):
+        with self._lock:
+            return list(self._by_customer.get(customer_username, {}).values())
+
+    def bookings_for_flight(self, flight_id):
+        with self._lock:
+            return list(self._by_flight.get(flight_id, {}).values())
+
+    def count_for_flight(self, flight_id):
+        return len(self._by_flight.get(flight_id, ()))
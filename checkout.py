@@ -0,0 +1,129 @@
+import threading
+import uuid
+
+from storage import group_commit
+
+# booking ids for a keyed checkout are uuid5(namespace, "<key>:<n>"), so a retry finds its
+# own bookings again even after a restart
+CHECKOUT_NAMESPACE = uuid.UUID("6f1c3f0e-55a1-4b1e-9d0e-3c2b1a0f9e71")
+KEEP_RECEIPTS = 10000  # receipts kept in memory for retries
+
+
+class Receipt:
+    def __init__(self, bookings, payments, replayed=False):
+        self.bookings = bookings
+        self.payments = payments
+        self.replayed = replayed  # True when the key had already been checked out
+
+    @property
+    def total(self):
+        return sum(p.amount for p in self.payments)
+
+
+class CheckoutManager:
+    # book-and-pay as one operation: seats are reserved under the flight lock, then the bookings and
+    # their payments are written in one group commit (one sqlite transaction; one journal append
+    # plus one payments append for csv, however many seats). if the charge fails the bookings are
+    # cancelled again, so a customer is never charged without a seat or seated without paying.
+    # an idempotency key makes a retry of the same purchase return the first receipt instead of
+    # buying again
+    def __init__(self, seating, payment_manager, pricing=None):
+        self.seating = seating
+        self.flight_manager = seating.flight_manager
+        self.booking_manager = seating.booking_manager
+        self.payment_manager = payment_manager
+        self.pricing = pricing
+        self._lock = threading.Lock()
+        self._keys = {}  # key -> Receipt, or None while that checkout is still running
+
+    def _booking_ids(self, key, count):
+        return [str(uuid.uuid5(CHECKOUT_NAMESPACE, f"{key}:{n}")) for n in range(count)]
+
+    def _replay(self, key, booking_ids):
+        # lock held; the receipt of an earlier checkout with this key, None if there was none
+        receipt = self._keys.get(key)
+        if receipt is not None:
+            return receipt
+        bookings = [b for b in map(self.booking_manager.get_booking, booking_ids) if b]
+        if not bookings:
+            return None
+        payments = [p for b in bookings for p in self.payment_manager.payments_for(b.booking_id)]
+        return Receipt(bookings, payments)
+
+    def _remember(self, key, receipt):
+        # lock held; completed receipts beyond KEEP_RECEIPTS are forgotten oldest first, their
+        # bookings still answer a retry through _replay
+        self._keys[key] = receipt
+        if len(self._keys) > KEEP_RECEIPTS:
+            for old in list(self._keys)[:len(self._keys) // 2]:
+                if self._keys[old] is not None:
+                    del self._keys[old]
+
+    def checkout(self, customer, flight_id, count=1, position="any", key=None):
+        # returns a Receipt, or None when the flight, the seats or the wallet fall short
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            print("Flight not found")
+            return None
+        booking_ids = None
+        if key:
+            booking_ids = self._booking_ids(key, count)
+            with self._lock:
+                if key in self._keys and self._keys[key] is None:
+                    print("Checkout already in progress")
+                    return None
+                receipt = self._replay(key, booking_ids)
+                if receipt is not None:
+                    self._remember(key, receipt)
+                    print("Checkout already completed")
+                    return Receipt(receipt.bookings, receipt.payments, replayed=True)
+                self._keys[key] = None  # claimed; a concurrent retry sees it in progress
+
+        receipt = None
+        try:
+            receipt = self._checkout(customer, flight, count, position, booking_ids)
+        finally:
+            if key:
+                with self._lock:
+                    if receipt is None:
+                        del self._keys[key]
+                    else:
+                        self._remember(key, receipt)
+        return receipt
+
+    def _checkout(self, customer, flight, count, position, booking_ids):
+        fare = self.pricing.quote(flight.flight_id) if self.pricing else flight.price
+        if self.payment_manager.balance(customer) < fare * count:
+            print("Insufficient balance")
+            return None
+        with self.flight_manager.lock_for(flight.flight_id):
+            seat_nos = self.seating.allocate_locked(flight, count, position)
+        if seat_nos is None:
+            return None
+
+        bookings = payments = None
+        try:
+            # manager locks before the database lock group_commit holds, the order their own writes use
+            with self.booking_manager._lock, self.payment_manager._lock, \
+                    group_commit(self.booking_manager.table, *self.payment_manager.tables):
+                bookings = self.booking_manager.book_reserved(customer.username, flight.flight_id, seat_nos,
+                                                              booking_ids)
+                payments = self.payment_manager.charge(customer, flight, fare, [b.booking_id for b in bookings])
+                if payments is None:
+                    raise _Declined()
+        except Exception as e:
+            # unwind: cancelling frees the seats (and hands them on to the waitlist)
+            if bookings:
+                for booking in bookings:
+                    self.booking_manager.cancel_booking(booking.booking_id, self.flight_manager)
+            else:
+                self.seating.release(flight.flight_id, seat_nos)
+            if isinstance(e, _Declined):
+                return None
+            raise
+        return Receipt(bookings, payments)
+
+
+class _Declined(Exception):
+    # the wallet no longer covers the charge; rolls the group commit back
+    pass
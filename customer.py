@@ -1,6 +1,77 @@
 import csv
 import hashlib
 import os
+import threading
+
+import storage
+from events import EventSource
+from storage import open_table
+
+USER_FIELDS = ["name", "email", "password_hash", "role"]
+
+
+class UserDirectory(EventSource):
+    # in-memory copy of the users table keyed by lowercased email and name,
+    # reloaded only when the table's stamp (mtime/size for csv) changes.
+    # events: "load" (None) and "add" (the user row)
+    def __init__(self, file_path, backend=None):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self.table = open_table("users", file_path, backend=backend, lock=self._lock)
+        self.by_email = {}
+        self.by_name = {}
+        self._stamp = None
+
+    def refresh(self):
+        with self._lock:
+            stamp = self.table.stamp()
+            if stamp == self._stamp:
+                return
+            by_email, by_name = {}, {}
+            for row in self.table.load():
+                self._index(by_email, by_name, row)
+            self.by_email, self.by_name = by_email, by_name
+            self._stamp = stamp
+            self._emit("load")
+
+    @staticmethod
+    def _index(by_email, by_name, row):
+        # first row wins, the same way the old top-to-bottom scan behaved
+        by_email.setdefault(row["email"].lower(), row)
+        by_name.setdefault(row["name"].lower(), row)
+
+    def get(self, email):
+        self.refresh()
+        return self.by_email.get(email.lower())
+
+    def name_exists(self, name):
+        self.refresh()
+        return name.lower() in self.by_name
+
+    def add(self, row):
+        with self._lock:
+            self.refresh()
+            if row["email"].lower() in self.by_email:
+                return False
+            self.table.insert(row)
+            self._index(self.by_email, self.by_name, row)
+            self._stamp = self.table.stamp()
+            self._emit("add", row)
+            return True
+
+
+_directories = {}  # path -> UserDirectory
+_directories_lock = threading.Lock()
+
+
+def user_directory(path):
+    # one shared directory per users file
+    with _directories_lock:
+        directory = _directories.get(path)
+        if directory is None:
+            directory = _directories[path] = UserDirectory(path)
+        return directory
+
 
 class Customer:
     FILENAME = "users.csv"
@@ -16,28 +87,36 @@ class Customer:
 
     @classmethod
     def ensure_file(cls):
-        if not os.path.exists(cls.FILENAME):
+        if storage.STORAGE_BACKEND == "csv" and not os.path.exists(cls.FILENAME):
             with open(cls.FILENAME, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
-                writer.writerow(["name", "email", "password_hash", "role"])
+                writer.writerow(USER_FIELDS)
+
+    @classmethod
+    def directory(cls):
+        return user_directory(cls.FILENAME)
+
+    @classmethod
+    def email_exists(cls, email):
+        return cls.directory().get(email) is not None
+
+    @classmethod
+    def name_exists(cls, name):
+        return cls.directory().name_exists(name)
 
     @classmethod
     def register(cls, name, email, password, role="customer"):
         cls.ensure_file()
 
         # التحقق من وجود ايميل مسبقًا
-        with open(cls.FILENAME, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["email"].lower() == email.lower():
-                    print("Already registered with this email.")
-                    return None
+        if cls.email_exists(email):
+            print("Already registered with this email.")
+            return None
 
         pwd_hash = cls.hash_password(password)
-
-        with open(cls.FILENAME, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow([name, email, pwd_hash, role])
+        if not cls.directory().add({"name": name, "email": email, "password_hash": pwd_hash, "role": role}):
+            print("Already registered with this email.")
+            return None
 
         print("Registered Successfully.")
         return cls(name, email, role)
@@ -47,12 +126,10 @@ class Customer:
         cls.ensure_file()
         pwd_hash = cls.hash_password(password)
 
-        with open(cls.FILENAME, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["email"].lower() == email.lower() and row["password_hash"] == pwd_hash:
-                    print(f"Login Successfully by: {row['role']}")
-                    return cls(row["name"], row["email"], row["role"])
+        row = cls.directory().get(email)
+        if row and row["password_hash"] == pwd_hash:
+            print(f"Login Successfully by: {row['role']}")
+            return cls(row["name"], row["email"], row["role"])
 
         print("Wrong email or password.")
         return None
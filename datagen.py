@@ -0,0 +1,119 @@
+import argparse
+import csv
+import hashlib
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from storage import SCHEMAS
+
+CITIES = ["Cairo", "Paris", "London", "Dubai", "Jeddah", "Riyadh", "Rome", "Istanbul", "Madrid", "Berlin",
+          "Athens", "Doha", "Amman", "Tunis", "Casablanca", "Frankfurt", "Vienna", "Zurich", "Milan", "Lisbon"]
+AIRLINES = ["Egypt Airline", "Air France", "Emirates", "Saudia", "Lufthansa", "Turkish", "Qatar"]
+PASSWORD = "password"  # every generated user (and the generated admin) logs in with this
+SEATS_PER_FLIGHT = 150
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _write(path, table, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SCHEMAS[table][0])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def generate(out_dir, flights=1000, bookings=10000, users=1000, payments=10000, seed=0,
+             start=datetime(2027, 1, 1)):
+    # writes flights / bookings / users / payments / admins csv files in the app's schemas.
+    # the same arguments always produce byte-identical files
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    pwd_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    capacity = flights * SEATS_PER_FLIGHT
+    if bookings > capacity:
+        raise ValueError(f"{bookings} bookings don't fit in {flights} flights of {SEATS_PER_FLIGHT} seats")
+
+    flight_rows = []
+    for n in range(flights):
+        origin, destination = rng.sample(CITIES, 2)
+        departure = start + timedelta(days=rng.randrange(365), minutes=5 * rng.randrange(288))
+        flight_rows.append({
+            "flight_id": _uuid(rng),
+            "flight_number": f"{rng.choice('ABCDEFGHJKMNPRSTUVWXYZ')}{rng.choice('ABCDEFGHJKMNPRSTUVWXYZ')}{n}",
+            "origin": origin,
+            "destination": destination,
+            "price": float(rng.randrange(50, 2000)),
+            "date": departure.strftime("%Y-%m-%d"),
+            "departure_time": departure.strftime("%H:%M:%S"),
+            "duration": f"{rng.randrange(1, 14):02d}:{5 * rng.randrange(12):02d}:00",
+            "airline": rng.choice(AIRLINES),
+        })
+    _write(os.path.join(out_dir, "flights.csv"), "flights", flight_rows)
+
+    user_rows = [{"name": f"User {n}", "email": f"user{n}@example.com", "password_hash": pwd_hash,
+                  "role": "customer"} for n in range(users)]
+    _write(os.path.join(out_dir, "users.csv"), "users", user_rows)
+
+    _write(os.path.join(out_dir, "admins.csv"), "admins", [
+        {"admin_id": _uuid(rng), "username": "admin", "name": "Benchmark Admin", "password_hash": pwd_hash}
+    ])
+
+    # each booking takes the next free seat of a random flight that still has room
+    next_seat = [0] * flights
+    open_flights = list(range(flights))
+    booking_rows = []
+    for _ in range(bookings):
+        i = rng.randrange(len(open_flights))
+        f = open_flights[i]
+        next_seat[f] += 1
+        if next_seat[f] == SEATS_PER_FLIGHT:
+            open_flights[i] = open_flights[-1]
+            open_flights.pop()
+        booked_at = start - timedelta(seconds=rng.randrange(180 * 86400))
+        booking_rows.append({
+            "booking_id": _uuid(rng),
+            "customer_username": user_rows[rng.randrange(users)]["email"] if users else "guest",
+            "flight_id": flight_rows[f]["flight_id"],
+            "seat_no": f"S{next_seat[f]}",
+            "date": booked_at.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    _write(os.path.join(out_dir, "bookings.csv"), "bookings", booking_rows)
+
+    price_by_id = {r["flight_id"]: r["price"] for r in flight_rows}
+    payment_rows = []
+    for n in range(payments):
+        # payments follow the bookings while there are any, then fall back to random flights
+        if n < len(booking_rows):
+            b = booking_rows[n]
+            customer, flight_id, paid_at = b["customer_username"], b["flight_id"], b["date"]
+        else:
+            customer = user_rows[rng.randrange(users)]["email"] if users else "guest"
+            flight_id = flight_rows[rng.randrange(flights)]["flight_id"] if flights else ""
+            paid_at = (start - timedelta(seconds=rng.randrange(180 * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+        payment_rows.append({"payment_id": _uuid(rng), "customer_username": customer,
+                             "flight_id": flight_id, "amount": price_by_id.get(flight_id, 0.0), "date": paid_at})
+    _write(os.path.join(out_dir, "payments.csv"), "payments", payment_rows)
+
+    return {"flights": flights, "bookings": bookings, "users": users, "payments": payments}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic airline data in the project's CSV schemas")
+    parser.add_argument("out_dir")
+    parser.add_argument("--flights", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--payments", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = generate(args.out_dir, args.flights, args.bookings, args.users, args.payments, args.seed)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
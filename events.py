@@ -0,0 +1,15 @@
+class EventSource:
+    # managers call _emit(event, record) after a change is stored; listeners get the same two arguments.
+    # the listener tuple is replaced on subscribe, so _emit never needs a lock
+    _listeners = ()
+
+    def subscribe(self, listener):
+        self._listeners = (*self._listeners, listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        self._listeners = tuple(l for l in self._listeners if l != listener)  # bound methods are equal, never identical
+
+    def _emit(self, event, record=None):
+        for listener in self._listeners:
+            listener(event, record)
@@ -1,16 +1,188 @@
+import bisect
+import copy
+import math
 import uuid
-import csv
 import os
+import threading
 from datetime import datetime
 from typing import Dict
 
 import hashlib
 from admin import AdminManager as User
+from events import EventSource
+from importer import ImportReport
+from storage import open_table, paused_gc
 
-class Seat:
-    def __init__(self, seat_no):
-        self.seat_no = seat_no
-        self.is_reserved = False
+def _parses(value, fmt):
+    try:
+        datetime.strptime(str(value), fmt)
+        return True
+    except ValueError:
+        return False
+
+
+SEATS_PER_ROW = 6  # seat letters A-F: A and F are windows, C and D sit on the aisle
+DEFAULT_SEAT_COUNT = 150  # also what a stored flight without a seat_count gets
+
+
+def _group_starts():
+    # for every free-seat mask of a row (bit c set = column c free) and group size k, the first
+    # column of k free seats side by side, preferring blocks that do not straddle the aisle
+    table = []
+    for mask in range(1 << SEATS_PER_ROW):
+        starts = [0] + [None] * SEATS_PER_ROW
+        for k in range(1, SEATS_PER_ROW + 1):
+            run = (1 << k) - 1
+            fits = [c for c in range(SEATS_PER_ROW - k + 1) if mask & (run << c) == run << c]
+            same_side = [c for c in fits if c + k <= SEATS_PER_ROW // 2 or c >= SEATS_PER_ROW // 2]
+            starts[k] = (same_side or fits or [None])[0]
+        table.append(starts)
+    return table
+
+
+_GROUP_START = _group_starts()
+_LONGEST_RUN = [max(k for k, start in enumerate(starts) if start is not None) for starts in _GROUP_START]
+
+
+class SeatMap:
+    # reservation state for one flight: one byte per seat ("S1" is index 0),
+    # allocated on the first reservation so unbooked flights cost almost nothing.
+    # seats fill rows of SEATS_PER_ROW ("S1".."S6" is row 1, A-F); the per-row free masks
+    # used by the seating engine are only built once something asks for them
+    __slots__ = ("seat_count", "reserved_count", "_taken", "_next_free", "_rows", "_by_run", "_cursors")
+
+    def __init__(self, seat_count: int = DEFAULT_SEAT_COUNT):
+        self.seat_count = seat_count
+        self.reserved_count = 0
+        self._taken = None
+        self._next_free = 0  # no free seat exists below this index
+        self._rows = None     # row -> free-seat bitmask
+        self._by_run = None   # longest free run -> rows that have it
+        self._cursors = None  # column mask -> no matching free seat exists below this row
+
+    def _index(self, seat_no):
+        if not isinstance(seat_no, str) or not seat_no.startswith("S") or not seat_no[1:].isdigit():
+            return -1
+        i = int(seat_no[1:]) - 1
+        return i if 0 <= i < self.seat_count else -1
+
+    def __len__(self):
+        return self.seat_count
+
+    def __contains__(self, seat_no):
+        return self._index(seat_no) >= 0
+
+    def __iter__(self):
+        return (f"S{n}" for n in range(1, self.seat_count + 1))
+
+    def is_reserved(self, seat_no):
+        i = self._index(seat_no)
+        return i >= 0 and self._taken is not None and self._taken[i] == 1
+
+    def reserve(self, seat_no):
+        i = self._index(seat_no)
+        if i < 0:
+            return False
+        if self._taken is None:
+            self._taken = bytearray(self.seat_count)
+        if self._taken[i]:
+            return False
+        self._taken[i] = 1
+        self.reserved_count += 1
+        if self._rows is not None:
+            self._set_free(i, False)
+        return True
+
+    def release(self, seat_no):
+        i = self._index(seat_no)
+        if i < 0 or self._taken is None or not self._taken[i]:
+            return False
+        self._taken[i] = 0
+        self.reserved_count -= 1
+        if i < self._next_free:
+            self._next_free = i
+        if self._rows is not None:
+            self._set_free(i, True)
+        return True
+
+    def next_free(self):
+        # the cursor only moves forward past taken seats, so this is amortized O(1)
+        if self._taken is None:
+            return "S1" if self.seat_count else None
+        while self._next_free < self.seat_count and self._taken[self._next_free]:
+            self._next_free += 1
+        if self._next_free == self.seat_count:
+            return None
+        return f"S{self._next_free + 1}"
+
+    def free_count(self):
+        return self.seat_count - self.reserved_count
+
+    @property
+    def row_count(self):
+        return -(-self.seat_count // SEATS_PER_ROW)
+
+    def _row_masks(self):
+        if self._rows is None:
+            rows, by_run = [], [set() for _ in range(SEATS_PER_ROW + 1)]
+            for first in range(0, self.seat_count, SEATS_PER_ROW):
+                mask = 0
+                for c in range(min(SEATS_PER_ROW, self.seat_count - first)):
+                    if self._taken is None or not self._taken[first + c]:
+                        mask |= 1 << c
+                by_run[_LONGEST_RUN[mask]].add(len(rows))
+                rows.append(mask)
+            self._rows, self._by_run, self._cursors = rows, by_run, {}
+        return self._rows
+
+    def _set_free(self, i, free):
+        row, c = divmod(i, SEATS_PER_ROW)
+        old = self._rows[row]
+        new = old | (1 << c) if free else old & ~(1 << c)
+        self._rows[row] = new
+        if _LONGEST_RUN[old] != _LONGEST_RUN[new]:
+            self._by_run[_LONGEST_RUN[old]].discard(row)
+            self._by_run[_LONGEST_RUN[new]].add(row)
+        if free:
+            for columns, cursor in self._cursors.items():
+                if row < cursor and columns >> c & 1:
+                    self._cursors[columns] = row
+
+    def next_free_in(self, columns, first_row=0, last_row=None):
+        # lowest free seat whose column bit is set in `columns`, within rows first_row..last_row
+        # (0-based, inclusive). like next_free, each column set keeps a cursor that only moves
+        # forward past rows with nothing left for it, so repeated calls are amortized O(1)
+        rows = self._row_masks()
+        last_row = len(rows) - 1 if last_row is None else min(last_row, len(rows) - 1)
+        cursor = self._cursors.get(columns, 0)
+        row = max(first_row, cursor)
+        while row <= last_row:
+            free = rows[row] & columns
+            if free:
+                break
+            row += 1
+        if first_row <= cursor:
+            self._cursors[columns] = row
+        if row > last_row:
+            return None
+        return f"S{row * SEATS_PER_ROW + (free & -free).bit_length()}"
+
+    def free_block(self, size, first_row=0, last_row=None):
+        # `size` free seats side by side in the lowest row that has room, or None. only the rows
+        # bucketed under a long enough free run are looked at, never the individual seats
+        if not 0 < size <= SEATS_PER_ROW:
+            return None
+        rows = self._row_masks()
+        last_row = len(rows) - 1 if last_row is None else last_row
+        best = None
+        for run in range(size, SEATS_PER_ROW + 1):
+            for row in self._by_run[run]:
+                if first_row <= row <= last_row and (best is None or row < best):
+                    best = row
+        if best is None:
+            return None
+        start = best * SEATS_PER_ROW + _GROUP_START[rows[best]][size]
+        return [f"S{i + 1}" for i in range(start, start + size)]
 
 
 class Flight:
@@ -20,7 +192,7 @@ class Flight:
                  departure_time: str,
                  duration: str,
                  airline: str = "Unknown",
-                 seat_count: int = 150):
+                 seat_count: int = DEFAULT_SEAT_COUNT):
 
         self.flight_id = str(uuid.uuid4())
         self.flight_number = flight_number
@@ -32,83 +204,261 @@ class Flight:
         self.duration = duration
         self.airline = airline
 
-        self.seats = {f"S{n}": Seat(f"S{n}") for n in range(1, seat_count + 1)}
+        self.seats = SeatMap(seat_count)
+
+    @classmethod
+    def from_row(cls, row):
+        f = cls.__new__(cls)
+        f.flight_id = row["flight_id"]
+        f.flight_number = row["flight_number"]
+        f.origin = row["origin"]
+        f.destination = row["destination"]
+        f.price = float(row["price"])
+        f.date = row["date"]
+        f.departure_time = row["departure_time"]
+        f.duration = row["duration"]
+        f.airline = row["airline"]
+        f.seats = SeatMap(int(row.get("seat_count") or DEFAULT_SEAT_COUNT))
+        return f
+
+
+class SearchPage:
+    # one page of FlightManager.search results; next_page() re-runs the same query
+    def __init__(self, manager, query, flights, total, page, page_size):
+        self.manager = manager
+        self.query = query
+        self.flights = flights
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(self.total / self.page_size))
 
+    @property
+    def has_next(self):
+        return self.page < self.pages
 
-class FlightManager:
-    def __init__(self, file_path="flights.csv"):
+    def next_page(self):
+        if not self.has_next:
+            return None
+        return self.manager.search(page=self.page + 1, page_size=self.page_size, **self.query)
+
+    def __iter__(self):
+        return iter(self.flights)
+
+    def __len__(self):
+        return len(self.flights)
+
+
+class FlightManager(EventSource):
+    # events: "load", "add", "edit" and "delete", each with the Flight (None for "load")
+    def __init__(self, file_path="flights.csv", backend=None):
         self.file_path = file_path
+        self._lock = threading.RLock()
+        self.table = open_table("flights", file_path, rows=self._rows, backend=backend, lock=self._lock)
+        # writers swap in a new dict under _lock, and an edited Flight is replaced rather than changed
+        # in place, so readers can iterate self.flights and read a flight's fields without locking
         self.flights: Dict[str, Flight] = {}
+        self._flight_locks: Dict[str, threading.Lock] = {}
+        # search indexes: sorted (date, departure_time, flight_id) keys, overall and per origin / destination / route
+        self._by_departure = []
+        self._by_origin: Dict[str, list] = {}
+        self._by_destination: Dict[str, list] = {}
+        self._by_route: Dict[tuple, list] = {}
+        self._search_keys: Dict[str, tuple] = {}  # flight_id -> (key, origin, destination) it was indexed under
         self.load_flights()
 
+    def lock_for(self, flight_id):
+        # per-flight lock guarding seat reservation, so bookings on different flights never contend
+        lock = self._flight_locks.get(flight_id)
+        if lock is None:
+            lock = self._flight_locks.setdefault(flight_id, threading.Lock())
+        return lock
+
     def load_flights(self):
-        try:
-            with open(self.file_path, mode="r", newline="", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    flight = Flight(
-                        flight_number=row["flight_number"],
-                        origin=row["origin"],
-                        destination=row["destination"],
-                        price=float(row["price"]),
-                        date=row["date"],
-                        departure_time=row["departure_time"],
-                        duration=row["duration"],
-                        airline=row["airline"]
-                    )
-                    flight.flight_id = row["flight_id"]
-                    self.flights[flight.flight_id] = flight
-        except FileNotFoundError:
-            pass
+        flights = {}
+        with paused_gc():
+            for row in self.table.load():
+                flight = Flight.from_row(row)
+                flights[flight.flight_id] = flight
+        with self._lock:
+            self.flights = flights
+            self._rebuild_search_index()
+            self._emit("load")
 
-    def save_flights(self):
-        with open(self.file_path, mode="w", newline="", encoding="utf-8") as file:
-            fieldnames = [
-                "flight_id","flight_number","origin","destination",
-                "price","date","departure_time","duration","airline"
-            ]
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
+    def _search_key(self, f):
+        return (str(f.date), str(f.departure_time), f.flight_id), f.origin.strip().lower(), f.destination.strip().lower()
 
-            for f in self.flights.values():
-                writer.writerow({
-                    "flight_id": f.flight_id,
-                    "flight_number": f.flight_number,
-                    "origin": f.origin,
-                    "destination": f.destination,
-                    "price": f.price,
-                    "date": f.date,
-                    "departure_time": f.departure_time,
-                    "duration": f.duration,
-                    "airline": f.airline
-                })
+    def _rebuild_search_index(self):
+        self._by_departure, self._by_origin, self._by_destination, self._by_route = [], {}, {}, {}
+        self._search_keys = {}
+        for f in self.flights.values():
+            key, origin, destination = self._search_keys[f.flight_id] = self._search_key(f)
+            self._by_departure.append(key)
+            self._by_origin.setdefault(origin, []).append(key)
+            self._by_destination.setdefault(destination, []).append(key)
+            self._by_route.setdefault((origin, destination), []).append(key)
+        for keys in (self._by_departure, *self._by_origin.values(),
+                     *self._by_destination.values(), *self._by_route.values()):
+            keys.sort()
+
+    def _index_flight(self, f):
+        key, origin, destination = self._search_keys[f.flight_id] = self._search_key(f)
+        bisect.insort(self._by_departure, key)
+        bisect.insort(self._by_origin.setdefault(origin, []), key)
+        bisect.insort(self._by_destination.setdefault(destination, []), key)
+        bisect.insort(self._by_route.setdefault((origin, destination), []), key)
+
+    def _unindex_flight(self, flight_id):
+        entry = self._search_keys.pop(flight_id, None)
+        if entry is None:
+            return
+        key, origin, destination = entry
+        for index, group in ((None, None), (self._by_origin, origin),
+                             (self._by_destination, destination), (self._by_route, (origin, destination))):
+            keys = self._by_departure if index is None else index[group]
+            del keys[bisect.bisect_left(keys, key)]
+            if index is not None and not keys:
+                del index[group]
+
+    def _row(self, f):
+        return {
+            "flight_id": f.flight_id,
+            "flight_number": f.flight_number,
+            "origin": f.origin,
+            "destination": f.destination,
+            "price": f.price,
+            "date": f.date,
+            "departure_time": f.departure_time,
+            "duration": f.duration,
+            "airline": f.airline,
+            "seat_count": f.seats.seat_count
+        }
+
+    def _rows(self):
+        return [self._row(f) for f in self.flights.values()]
+
+    def save_flights(self):
+        with self._lock:
+            self.table.save()
 
     def add_flight(self, admin: User, flight: Flight):
         if admin.role != "admin":
             print("Access denied. Admin only.")
             return False
 
-        self.flights[flight.flight_id] = flight
-        self.save_flights()
+        with self._lock:
+            self._unindex_flight(flight.flight_id)
+            self.flights = {**self.flights, flight.flight_id: flight}
+            self._index_flight(flight)
+            self.table.insert(self._row(flight))
+            self._emit("add", flight)
         print("Flight added successfully")
         return True
 
+    def _flight_from_import(self, row):
+        if row is None:
+            raise ValueError("malformed row")
+        required = ("flight_number", "origin", "destination", "price", "date", "departure_time", "duration")
+        missing = [c for c in required if not str(row.get(c) or "").strip()]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        try:
+            price = float(row["price"])
+        except ValueError:
+            raise ValueError(f"invalid price {row['price']!r}") from None
+        if price < 0:
+            raise ValueError("price must not be negative")
+        try:
+            datetime.strptime(row["date"], "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"invalid date {row['date']!r}, expected YYYY-MM-DD") from None
+        for column in ("departure_time", "duration"):
+            value = row[column]
+            if not any(_parses(value, fmt) for fmt in ("%H:%M:%S", "%H:%M")):
+                raise ValueError(f"invalid {column} {value!r}, expected HH:MM[:SS]")
+        try:
+            seat_count = int(row.get("seat_count") or DEFAULT_SEAT_COUNT)
+        except ValueError:
+            raise ValueError(f"invalid seat_count {row['seat_count']!r}") from None
+        if seat_count < 1:
+            raise ValueError("seat_count must be at least 1")
+
+        flight = Flight(row["flight_number"], row["origin"], row["destination"], price, row["date"],
+                        row["departure_time"], row["duration"], row.get("airline") or "Unknown", seat_count)
+        if row.get("flight_id"):
+            flight.flight_id = row["flight_id"]
+        return flight
+
+    def bulk_add_flights(self, admin: User, rows):
+        # validates a stream of row dicts, rejects bad rows and duplicates (same flight_id, or the
+        # same flight_number on the same date) and stores the rest with a single write
+        report = ImportReport()
+        if admin.role != "admin":
+            print("Access denied. Admin only.")
+            report.reject(0, "access denied, admin only")
+            return report
+
+        with self._lock:
+            seen_ids = set(self.flights)
+            seen_numbers = {(f.flight_number, str(f.date)) for f in self.flights.values()}
+            batch = []
+            for n, row in enumerate(rows, start=1):
+                try:
+                    flight = self._flight_from_import(row)
+                except ValueError as e:
+                    report.reject(n, str(e))
+                    continue
+                if flight.flight_id in seen_ids:
+                    report.reject(n, f"duplicate flight_id {flight.flight_id}")
+                    continue
+                if (flight.flight_number, flight.date) in seen_numbers:
+                    report.reject(n, f"flight {flight.flight_number} already scheduled on {flight.date}")
+                    continue
+                seen_ids.add(flight.flight_id)
+                seen_numbers.add((flight.flight_number, flight.date))
+                batch.append(flight)
+
+            if batch:
+                previous = self.flights
+                self.flights = {**previous, **{f.flight_id: f for f in batch}}
+                try:
+                    self.table.insert_many(self._row(f) for f in batch)
+                except Exception:
+                    self.flights = previous
+                    raise
+                self._rebuild_search_index()
+                self._emit("load")
+            report.added = len(batch)
+
+        print(f"Bulk import: {report.added} flights added, {len(report.errors)} rejected")
+        return report
+
     def edit_flight(self, admin: User, flight_id: str, **updates):
         if admin.role != "admin":
             print("Access denied. Admin only.")
             return False
 
-        if flight_id not in self.flights:
-            print("Flight not found")
-            return False
+        with self._lock:
+            if flight_id not in self.flights:
+                print("Flight not found")
+                return False
 
-        flight = self.flights[flight_id]
+            # edited on a copy that is swapped in whole, so a reader never sees a half-edited
+            # flight; the copy shares the seat map, reservations made meanwhile are kept
+            flight = copy.copy(self.flights[flight_id])
+            for key, value in updates.items():
+                if hasattr(flight, key):
+                    setattr(flight, key, value)
 
-        for key, value in updates.items():
-            if hasattr(flight, key):
-                setattr(flight, key, value)
+            self._unindex_flight(flight_id)
+            self.flights = {**self.flights, flight_id: flight}
+            self._index_flight(flight)
 
-        self.save_flights()
+            self.table.update(self._row(flight))
+            self._emit("edit", flight)
         print("Flight updated successfully")
         return True
 
@@ -117,16 +467,76 @@ class FlightManager:
             print("Access denied. Admin only.")
             return False
 
-        if flight_id in self.flights:
-            del self.flights[flight_id]
-            self.save_flights()
-            print("Flight deleted")
-            return True
+        with self._lock:
+            if flight_id in self.flights:
+                flights = dict(self.flights)
+                flight = flights.pop(flight_id)
+                self.flights = flights
+                self._unindex_flight(flight_id)
+                self.table.delete(flight_id)
+                self._emit("delete", flight)
+                print("Flight deleted")
+                return True
 
         print("Flight not found")
         return False
 
-    def list_flights(self):
-        for f in self.flights.values():
+    def restore_reservations(self, booking_manager):
+        # seat maps are not stored in flights.csv, so rebuild them from the bookings
+        with self._lock:
+            for f in self.flights.values():
+                f.seats = SeatMap(len(f.seats))
+            for b in booking_manager.bookings:
+                flight = self.flights.get(b.flight_id)
+                if flight:
+                    flight.seats.reserve(b.seat_no)
+
+    def search(self, origin=None, destination=None, date_from=None, date_to=None,
+               min_price=None, max_price=None, sort_by="departure", page=1, page_size=20):
+        # origin / destination are exact, case-insensitive matches; dates are inclusive "YYYY-MM-DD" bounds.
+        # the route / origin / destination / overall departure index narrows the candidates, a bisect
+        # on the date range cuts them down further, and only the requested page is materialized
+        if sort_by not in ("departure", "price"):
+            raise ValueError("sort_by must be 'departure' or 'price'")
+        page = max(1, int(page))
+        query = {"origin": origin, "destination": destination, "date_from": date_from, "date_to": date_to,
+                 "min_price": min_price, "max_price": max_price, "sort_by": sort_by}
+        origin = origin.strip().lower() if origin else None
+        destination = destination.strip().lower() if destination else None
+
+        with self._lock:
+            if origin and destination:
+                keys = self._by_route.get((origin, destination), [])
+            elif origin:
+                keys = self._by_origin.get(origin, [])
+            elif destination:
+                keys = self._by_destination.get(destination, [])
+            else:
+                keys = self._by_departure
+            lo = bisect.bisect_left(keys, (str(date_from),)) if date_from else 0
+            hi = bisect.bisect_right(keys, (str(date_to), "\uffff")) if date_to else len(keys)
+            start = (page - 1) * page_size
+            flights = self.flights
+
+            if sort_by == "departure" and min_price is None and max_price is None:
+                total = max(0, hi - lo)
+                selected = [flights[k[2]] for k in keys[lo + start:min(hi, lo + start + page_size)]]
+            else:
+                matches = [flights[k[2]] for k in keys[lo:hi]]
+                if min_price is not None:
+                    matches = [f for f in matches if float(f.price) >= min_price]
+                if max_price is not None:
+                    matches = [f for f in matches if float(f.price) <= max_price]
+                if sort_by == "price":
+                    matches.sort(key=lambda f: float(f.price))  # stable, so ties stay in departure order
+                total = len(matches)
+                selected = matches[start:start + page_size]
+
+        return SearchPage(self, query, selected, total, page, page_size)
+
+    def list_flights(self, page=1, page_size=50, **filters):
+        result = self.search(page=page, page_size=page_size, **filters)
+        for f in result:
             print(f"{f.flight_number} | {f.origin} -> {f.destination} | {f.price} | {f.date} {f.departure_time}")
+        print(f"Page {result.page}/{result.pages} ({result.total} flights)")
 
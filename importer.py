@@ -0,0 +1,40 @@
+import csv
+import json
+import os
+
+
+class ImportReport:
+    # outcome of a bulk_* call: how many rows were stored and why the others were rejected
+    def __init__(self):
+        self.added = 0
+        self.errors = []  # (row number, message), rows counted from 1
+
+    def reject(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __str__(self):
+        lines = [f"{self.added} rows added, {len(self.errors)} rejected"]
+        lines += [f"  row {n}: {message}" for n, message in self.errors]
+        return "\n".join(lines)
+
+
+def iter_rows(path):
+    # streams dict rows from a .csv or .jsonl file; a line that isn't valid json yields None
+    # so the caller can report it against its row number and keep going
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                yield row if isinstance(row, dict) else None
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
@@ -0,0 +1,103 @@
+import json
+import os
+import uuid
+from datetime import datetime
+
+from storage import SqliteTable, WriteBehindTable, open_table, paused_gc
+
+LEDGER_FILE = "ledger.csv"
+CHECKPOINT_EVERY = 1000  # ledger entries between balance checkpoints
+OPENING_BALANCE = 10000.0  # what a customer's account starts with
+
+
+class Ledger:
+    # append-only log of every wallet movement (signed: credits positive, debits negative) with the
+    # running balance of each customer kept in memory. a checkpoint of all balances and the log
+    # position it covers is written every CHECKPOINT_EVERY entries to <base>.checkpoint, so a
+    # start only replays the entries appended after it.
+    # owned by a PaymentManager and guarded by its lock
+    def __init__(self, file_path, lock, backend=None):
+        self.file_path = file_path
+        self._lock = lock
+        self.table = open_table("ledger", file_path, backend=backend, lock=lock)
+        self.checkpoint_path = os.path.splitext(file_path)[0] + ".checkpoint"
+        self.balances = {}  # customer_username -> balance
+        self.since_checkpoint = 0
+        self.load()
+
+    def _backing_table(self):
+        return self.table.table if isinstance(self.table, WriteBehindTable) else self.table
+
+    def _source(self):
+        # what a checkpoint's position refers to; a different file or backend invalidates it
+        table = self._backing_table()
+        if isinstance(table, SqliteTable):
+            return f"sqlite:{os.path.abspath(table.db.path)}"
+        return f"csv:{os.path.abspath(table.path)}"
+
+    def _checkpoint_due(self):
+        if self.since_checkpoint >= CHECKPOINT_EVERY:
+            self.checkpoint()
+
+    def load(self):
+        with self._lock, paused_gc():
+            balances, position = self._read_checkpoint()
+            rows = self.table.load_since(position) if position else None
+            if rows is None:
+                balances, rows = {}, self.table.load()
+            for row in rows:
+                username = row["customer_username"]
+                balances[username] = balances.get(username, 0.0) + float(row["amount"])
+            self.balances = balances
+            self.since_checkpoint = len(rows)
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}, 0
+        if checkpoint.get("source") != self._source():
+            return {}, 0
+        return checkpoint["balances"], checkpoint["position"]
+
+    def checkpoint(self):
+        with self._lock:
+            if isinstance(self.table, WriteBehindTable):
+                self.table.flush()  # the position has to cover every entry the balances include
+            checkpoint = {"source": self._source(), "position": self.table.position(), "balances": self.balances}
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self.since_checkpoint = 0
+
+    def balance(self, username):
+        return self.balances.get(username, 0.0)
+
+    def has_account(self, username):
+        return username in self.balances
+
+    def post(self, entries):
+        # entries: (customer_username, amount, kind, ref); one write for all of them
+        with self._lock:
+            date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.table.insert_many({"entry_id": str(uuid.uuid4()), "customer_username": username,
+                                    "amount": amount, "kind": kind, "ref": ref, "date": date}
+                                   for username, amount, kind, ref in entries)
+            for username, amount, _, _ in entries:
+                self.balances[username] = self.balance(username) + amount
+            self.since_checkpoint += len(entries)
+            table = self._backing_table()
+            if isinstance(table, SqliteTable):
+                # a checkpoint inside an open transaction could cover entries that are then rolled back
+                table.db.after_commit(self._checkpoint_due)
+            else:
+                self._checkpoint_due()
+
+    def open_account(self, username, opening_balance):
+        # credits the opening balance once; later calls leave the account alone
+        with self._lock:
+            if not self.has_account(username):
+                self.post([(username, opening_balance, "opening", "")])
+            return self.balance(username)
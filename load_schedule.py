@@ -0,0 +1,44 @@
+import argparse
+import sys
+
+from admin import AdminManager
+from booking import BookingManager
+from flight import FlightManager
+from importer import iter_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load a flight schedule or bookings from CSV / JSONL")
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    flights = sub.add_parser("flights", help="import flights")
+    flights.add_argument("path")
+    flights.add_argument("--admin", default="admin", help="admin username the import runs as")
+    flights.add_argument("--password", required=True)
+
+    bookings = sub.add_parser("bookings", help="import bookings")
+    bookings.add_argument("path")
+
+    parser.add_argument("--flights-file", default="flights.csv")
+    parser.add_argument("--bookings-file", default="bookings.csv")
+    parser.add_argument("--admins-file", default="admins.csv")
+    args = parser.parse_args(argv)
+
+    flight_mgr = FlightManager(args.flights_file)
+    if args.kind == "flights":
+        admin = AdminManager(args.admins_file).login(args.admin, args.password)
+        if not admin:
+            return 1
+        admin.role = "admin"
+        report = flight_mgr.bulk_add_flights(admin, iter_rows(args.path))
+    else:
+        booking_mgr = BookingManager(args.bookings_file)
+        flight_mgr.restore_reservations(booking_mgr)
+        report = booking_mgr.bulk_create_bookings(iter_rows(args.path), flight_mgr)
+
+    print(report)
+    return 0 if report.ok else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
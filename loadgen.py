@@ -0,0 +1,231 @@
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from replay import percentile
+
+# weights of each request in the generated traffic, shaped like app use: mostly searches
+MIX = (("search", 60), ("login", 8), ("checkout", 10), ("bookings", 8), ("ticket", 6), ("payments", 4),
+       ("cancel", 3), ("report", 1))
+
+
+class Client:
+    # one keep-alive connection to the API and the session of the customer it plays
+    def __init__(self, url, email, password, timeout=10.0):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+        self.email = email
+        self.password = password
+        self.token = None
+        self.booking_ids = []
+
+    def request(self, method, path, body=None, token=None, headers=None):
+        # returns (status, decoded JSON or None); a dropped connection is reopened on the next call
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            self.conn.request(method, path, data, headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+        if response.will_close:
+            self.conn.close()
+        try:
+            return response.status, json.loads(raw) if raw else None
+        except ValueError:
+            return response.status, None
+
+    def login(self):
+        status, data = self.request("POST", "/login", {"email": self.email, "password": self.password})
+        if status == 401:
+            name = f"Load {self.email}"
+            self.request("POST", "/register", {"name": name, "email": self.email, "password": self.password})
+            status, data = self.request("POST", "/login", {"email": self.email, "password": self.password})
+        if status == 200:
+            self.token = data["token"]
+        return status
+
+
+def discover(url, pages=5, page_size=100):
+    # flight ids and routes to aim the traffic at
+    client = Client(url, "", "")
+    flights = []
+    for page in range(1, pages + 1):
+        status, data = client.request("GET", "/flights?" + urlencode({"page": page, "page_size": page_size}))
+        if status != 200:
+            raise RuntimeError(f"GET /flights answered {status}")
+        flights += data["flights"]
+        if page >= data["pages"]:
+            break
+    client.conn.close()
+    return flights
+
+
+def run(url, connections=8, duration=10.0, requests=None, email_format="user{n}@example.com", users=1000,
+        password="password", admin=("admin", "password"), seed=0):
+    # every connection runs its own loop of requests drawn from MIX until the duration (or the
+    # request budget) runs out; latencies are recorded per request type
+    flights = discover(url)
+    if not flights:
+        raise RuntimeError("the server has no flights")
+    ops, weights = zip(*MIX)
+    latencies = {}
+    statuses = {}
+    errors = {}
+    stats_lock = threading.Lock()
+    budget = [requests]
+    deadline = time.perf_counter() + duration
+
+    admin_client = Client(url, "", "")
+    status, data = admin_client.request("POST", "/login",
+                                        {"username": admin[0], "password": admin[1], "admin": True})
+    admin_token = data["token"] if status == 200 else None
+    admin_client.conn.close()
+
+    def take():
+        with stats_lock:
+            if budget[0] is None:
+                return time.perf_counter() < deadline
+            if budget[0] <= 0:
+                return False
+            budget[0] -= 1
+            return True
+
+    def record(op, started, status):
+        elapsed = time.perf_counter() - started
+        with stats_lock:
+            latencies.setdefault(op, []).append(elapsed)
+            statuses.setdefault(op, {})
+            statuses[op][status] = statuses[op].get(status, 0) + 1
+
+    def one(client, rng, op):
+        if op == "login":
+            return client.login()
+        if client.token is None and op != "search":
+            status = client.login()
+            if status != 200:
+                return status
+        if op == "search":
+            f = rng.choice(flights)
+            query = {"origin": f["origin"], "destination": f["destination"]}
+            return client.request("GET", "/flights?" + urlencode(query))[0]
+        if op == "checkout":
+            f = rng.choice(flights)
+            status, data = client.request("POST", "/checkout", {"flight_id": f["flight_id"]}, client.token,
+                                          {"Idempotency-Key": str(uuid.uuid4())})
+            if status == 201:
+                client.booking_ids += [b["booking_id"] for b in data["bookings"]]
+            return status
+        if op == "bookings":
+            return client.request("GET", "/bookings", token=client.token)[0]
+        if op == "payments":
+            return client.request("GET", "/payments", token=client.token)[0]
+        if op == "ticket":
+            if not client.booking_ids:
+                return client.request("GET", "/bookings", token=client.token)[0]
+            return client.request("GET", f"/tickets/{rng.choice(client.booking_ids)}", token=client.token)[0]
+        if op == "cancel":
+            if not client.booking_ids:
+                return client.request("GET", "/bookings", token=client.token)[0]
+            booking_id = client.booking_ids.pop(rng.randrange(len(client.booking_ids)))
+            return client.request("POST", f"/bookings/{booking_id}/cancel", {}, client.token)[0]
+        if op == "report":
+            return client.request("GET", "/reports", token=admin_token)[0]
+        raise ValueError(f"unknown op {op!r}")
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        client = Client(url, email_format.format(n=n % users), password)
+        while take():
+            op = rng.choices(ops, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = one(client, rng, op)
+            except Exception as e:
+                status = "error"
+                with stats_lock:
+                    errors.setdefault(op, []).append(f"{type(e).__name__}: {e}")
+            record(op, started, status)
+        client.conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(connections)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    per_op = {}
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        per_op[op] = {
+            "count": len(values),
+            "statuses": {str(k): v for k, v in sorted(statuses[op].items(), key=lambda kv: str(kv[0]))},
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+        }
+    busy = sum(s.get(503, 0) for s in statuses.values())
+    return {
+        "requests": total,
+        "connections": connections,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1) if elapsed else None,
+        "rejected_503": busy,
+        "ops": per_op,
+        "first_errors": {op: messages[:3] for op, messages in errors.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the HTTP API (server.py) and report throughput and latency")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--connections", type=int, default=8,
+                        help="keep-alive connections, one thread each; keep it at or below the server's workers")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead of after --duration")
+    parser.add_argument("--users", type=int, default=1000, help="distinct customers to spread the connections over")
+    parser.add_argument("--email-format", default="user{n}@example.com",
+                        help="customer emails; the datagen.py users by default, registered when missing")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--admin", default="admin")
+    parser.add_argument("--admin-password", default="password")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args.url, args.connections, args.duration, args.requests, args.email_format, args.users,
+                 args.password, (args.admin, args.admin_password), args.seed)
+
+    print(f"{result['requests']} requests over {result['connections']} connections: "
+          f"{result['seconds']}s, {result['requests_per_second']} requests/s, {result['rejected_503']} rejected")
+    print(f"{'op':<9} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for op, s in result["ops"].items():
+        codes = " ".join(f"{code}:{n}" for code, n in s["statuses"].items())
+        print(f"{op:<9} {s['count']:>7} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f}  {codes}")
+    for op, messages in result["first_errors"].items():
+        print(f"{op} errors: {'; '.join(messages)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
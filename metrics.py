@@ -0,0 +1,206 @@
+import functools
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# opt-in: AIRLINE_METRICS=1 times every manager method and storage call. while disabled the managers
+# are left unwrapped and storage pays one flag check per file operation
+ENABLED = os.environ.get("AIRLINE_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_PORT = os.environ.get("AIRLINE_METRICS_PORT")  # serve /metrics on this port when set
+METRICS_HOST = os.environ.get("AIRLINE_METRICS_HOST", "127.0.0.1")  # local only unless set, e.g. to 0.0.0.0
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # seconds
+
+# (module, class) pairs whose public methods install() wraps; modules not imported yet are skipped
+INSTRUMENTED = [
+    ("flight", "FlightManager"),
+    ("booking", "BookingManager"),
+    ("payment", "PaymentManager"),
+    ("admin", "AdminManager"),
+    ("customer", "Customer"),
+    ("customer", "UserDirectory"),
+    ("ticket", "TicketSystem"),
+    ("report", "ReportManager"),
+    ("routes", "RoutePlanner"),
+    ("analytics", "ColumnStore"),
+]
+
+_lock = threading.Lock()
+_calls = {}    # "Class.method" -> [count, errors, seconds, max seconds, bucket counts]
+_storage = {}  # (table, op) -> [count, seconds, rows read, rows written, bytes read, bytes written]
+_originals = {}  # (class, attribute) -> attribute before wrapping
+_server = None
+
+
+def clock():
+    return time.perf_counter()
+
+
+def record_call(name, seconds, failed=False):
+    with _lock:
+        stats = _calls.get(name)
+        if stats is None:
+            stats = _calls[name] = [0, 0, 0.0, 0.0, [0] * len(BUCKETS)]
+        stats[0] += 1
+        stats[1] += failed
+        stats[2] += seconds
+        stats[3] = max(stats[3], seconds)
+        buckets = stats[4]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+
+
+def record_io(table, op, started, rows=0, nbytes=0, write=False):
+    # called by storage after every load / save / append; `started` is a clock() value
+    if not ENABLED:
+        return
+    seconds = time.perf_counter() - started
+    with _lock:
+        stats = _storage.get((table, op))
+        if stats is None:
+            stats = _storage[(table, op)] = [0, 0.0, 0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[3 if write else 2] += rows
+        stats[5 if write else 4] += nbytes
+
+
+def _timed(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            record_call(name, time.perf_counter() - started, failed)
+    return wrapper
+
+
+def _instrument(cls):
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith("_") or (cls, attr) in _originals:
+            continue
+        if isinstance(value, (classmethod, staticmethod)):
+            wrapped = type(value)(_timed(f"{cls.__name__}.{attr}", value.__func__))
+        elif callable(value):
+            wrapped = _timed(f"{cls.__name__}.{attr}", value)
+        else:
+            continue
+        _originals[(cls, attr)] = value
+        setattr(cls, attr, wrapped)
+
+
+def install():
+    # wraps the public methods of every instrumented class that has been imported; safe to call again
+    for module_name, class_name in INSTRUMENTED:
+        module = sys.modules.get(module_name)
+        cls = getattr(module, class_name, None) if module else None
+        if cls is not None:
+            _instrument(cls)
+
+
+def uninstall():
+    for (cls, attr), value in list(_originals.items()):
+        setattr(cls, attr, value)
+    _originals.clear()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+    install()
+    if METRICS_PORT:
+        serve(int(METRICS_PORT), METRICS_HOST)
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    uninstall()
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+        _storage.clear()
+
+
+def snapshot():
+    # plain dicts for display: per-method timings, slowest total first, and per-table storage traffic
+    with _lock:
+        calls = [{"method": name, "calls": s[0], "errors": s[1], "total_ms": round(s[2] * 1000, 3),
+                  "avg_ms": round(s[2] * 1000 / s[0], 4), "max_ms": round(s[3] * 1000, 3)}
+                 for name, s in _calls.items()]
+        storage = [{"table": table, "op": op, "calls": s[0], "total_ms": round(s[1] * 1000, 3),
+                    "rows_read": s[2], "rows_written": s[3], "bytes_read": s[4], "bytes_written": s[5]}
+                   for (table, op), s in _storage.items()]
+    calls.sort(key=lambda c: c["total_ms"], reverse=True)
+    storage.sort(key=lambda s: s["total_ms"], reverse=True)
+    return {"calls": calls, "storage": storage}
+
+
+def _bound(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def prometheus_text():
+    # text exposition format, version 0.0.4
+    with _lock:
+        calls = {name: (s[0], s[1], s[2], list(s[4])) for name, s in _calls.items()}
+        storage = {key: list(s) for key, s in _storage.items()}
+
+    lines = ["# HELP airline_call_seconds Time spent in manager methods.",
+             "# TYPE airline_call_seconds histogram"]
+    for name, (count, _, seconds, buckets) in sorted(calls.items()):
+        for bound, n in zip(BUCKETS, buckets):
+            lines.append(f'airline_call_seconds_bucket{{method="{name}",le="{_bound(bound)}"}} {n}')
+        lines.append(f'airline_call_seconds_bucket{{method="{name}",le="+Inf"}} {count}')
+        lines.append(f'airline_call_seconds_sum{{method="{name}"}} {seconds}')
+        lines.append(f'airline_call_seconds_count{{method="{name}"}} {count}')
+    lines += ["# HELP airline_call_errors_total Manager method calls that raised.",
+              "# TYPE airline_call_errors_total counter"]
+    for name, (_, errors, _, _) in sorted(calls.items()):
+        lines.append(f'airline_call_errors_total{{method="{name}"}} {errors}')
+
+    series = [("airline_storage_ops_total", "Storage operations.", 0),
+              ("airline_storage_seconds_total", "Time spent in storage operations.", 1),
+              ("airline_storage_rows_read_total", "Rows read from storage.", 2),
+              ("airline_storage_rows_written_total", "Rows written to storage.", 3),
+              ("airline_storage_bytes_read_total", "Bytes read from storage files.", 4),
+              ("airline_storage_bytes_written_total", "Bytes written to storage files.", 5)]
+    for metric, help_text, i in series:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for (table, op), s in sorted(storage.items()):
+            lines.append(f'{metric}{{table="{table}",op="{op}"}} {s[i]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=9464, host="127.0.0.1"):
+    # scrape endpoint on a daemon thread, started once per process
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
@@ -1,66 +1,219 @@
-import csv
+import math
+import threading
 import uuid
 from datetime import datetime
 from customer import Customer
 from flight import Flight
+from events import EventSource
+from ledger import Ledger
+from storage import group_commit, open_table, paused_gc
 
 PAYMENTS_FILE = "payments.csv"
 
 class Payment:
-    def __init__(self, customer_username: str, flight_id: str, amount: float):
+    def __init__(self, customer_username: str, flight_id: str, amount: float, ref: str = ""):
         self.payment_id = str(uuid.uuid4())
         self.customer_username = customer_username
         self.flight_id = flight_id
-        self.amount = amount
+        self.amount = amount  # negative for a refund
         self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.ref = ref  # the booking paid (or refunded) for; empty for payments made before they were linked
 
+    @classmethod
+    def from_row(cls, row):
+        p = cls.__new__(cls)
+        p.payment_id = row["payment_id"]
+        p.customer_username = row["customer_username"]
+        p.flight_id = row["flight_id"]
+        p.amount = float(row["amount"])
+        p.date = row["date"]
+        p.ref = row.get("ref") or ""
+        return p
 
 
-class PaymentManager:
-    def __init__(self, file_path=PAYMENTS_FILE):
+
+class HistoryPage:
+    # one page of a customer's payments, newest first
+    def __init__(self, payments, total, page, page_size):
+        self.payments = payments
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(self.total / self.page_size))
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    def __iter__(self):
+        return iter(self.payments)
+
+
+class PaymentManager(EventSource):
+    # events: "load" (None) and "add" (the Payment, refunds included).
+    # with a ledger_path, balances live in a persistent Ledger instead of on the Customer object:
+    # every payment and refund is posted to it in the same group commit as the payment row, and
+    # customer.wallet is only kept as a copy of the ledger balance
+    def __init__(self, file_path=PAYMENTS_FILE, backend=None, ledger_path=None):
         self.file_path = file_path
+        self._lock = threading.RLock()
+        self.table = open_table("payments", file_path, rows=self._rows, backend=backend, lock=self._lock)
+        self.ledger = Ledger(ledger_path, self._lock, backend) if ledger_path else None
         self.payments = []
+        self._by_ref = {}       # booking_id -> [Payment] charged or refunded for it
+        self._by_customer = {}  # customer_username -> [Payment], oldest first
         self.load_payments()
 
+    @property
+    def tables(self):
+        # everything a payment writes to, for callers joining it to a wider group commit
+        return (self.table, self.ledger.table) if self.ledger else (self.table,)
+
     def load_payments(self):
-        try:
-            with open(self.file_path, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    p = Payment(row["customer_username"], row["flight_id"], float(row["amount"]))
-                    p.payment_id = row["payment_id"]
-                    p.date = row["date"]
-                    self.payments.append(p)
-        except FileNotFoundError:
-            pass
+        with self._lock, paused_gc():
+            self.payments = [Payment.from_row(row) for row in self.table.load()]
+            self._reindex()
+            self._emit("load")
+
+    def _reindex(self):
+        # lock held; rebuilds the per-booking and per-customer indexes after self.payments is replaced
+        self._by_ref, self._by_customer = {}, {}
+        for p in self.payments:
+            self._index(p)
+
+    def _index(self, p):
+        if p.ref:
+            self._by_ref.setdefault(p.ref, []).append(p)
+        self._by_customer.setdefault(p.customer_username, []).append(p)
+
+    def _add(self, payment, customer=None):
+        self._add_many([payment], customer)
+
+    def _add_many(self, payments, customer=None):
+        # lock held; the payment rows and their ledger entries go out in one group commit, and
+        # nothing is kept in memory if it fails. customer: the Customer whose wallet copy to update
+        with group_commit(*self.tables):
+            self.table.insert_many(self._row(p) for p in payments)
+            if self.ledger:
+                self.ledger.post([(p.customer_username, -p.amount, "refund" if p.amount < 0 else "payment",
+                                   p.payment_id) for p in payments])
+        for p in payments:
+            self.payments.append(p)
+            self._index(p)
+        if customer is not None:
+            if self.ledger:
+                customer.wallet = self.ledger.balance(customer.username)
+            else:
+                customer.wallet -= sum(p.amount for p in payments)
+        for p in payments:
+            self._emit("add", p)
+
+    def balance(self, customer):
+        # what the customer can spend: the ledger balance, or the session wallet without a ledger
+        if self.ledger:
+            return self.ledger.balance(customer.username)
+        return customer.wallet
+
+    def open_account(self, customer, opening_balance):
+        # gives a customer their starting balance the first time they are seen and syncs
+        # customer.wallet with the ledger; without a ledger the wallet starts over every session
+        with self._lock:
+            if self.ledger:
+                customer.wallet = self.ledger.open_account(customer.username, opening_balance)
+            elif not hasattr(customer, "wallet"):
+                customer.wallet = opening_balance
+            return customer.wallet
+
+    def history(self, customer_username, page=1, page_size=10):
+        # O(page): slices the customer's index from the newest end
+        with self._lock:
+            payments = self._by_customer.get(customer_username, [])
+            total = len(payments)
+            page = max(1, min(int(page), max(1, math.ceil(total / page_size))))
+            end = total - (page - 1) * page_size
+            items = payments[max(0, end - page_size):end][::-1]
+        return HistoryPage(items, total, page, page_size)
+
+    def _row(self, p):
+        return {
+            "payment_id": p.payment_id,
+            "customer_username": p.customer_username,
+            "flight_id": p.flight_id,
+            "amount": p.amount,
+            "date": p.date,
+            "ref": p.ref
+        }
+
+    def _rows(self):
+        return [self._row(p) for p in self.payments]
 
     def save_payments(self):
-        with open(self.file_path, "w", newline="", encoding="utf-8") as f:
-            fieldnames = ["payment_id", "customer_username", "flight_id", "amount", "date"]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for p in self.payments:
-                writer.writerow({
-                    "payment_id": p.payment_id,
-                    "customer_username": p.customer_username,
-                    "flight_id": p.flight_id,
-                    "amount": p.amount,
-                    "date": p.date
-                })
-
-    def make_payment(self, customer: Customer, flight: Flight):
-        if customer.wallet < flight.price:
-            print("Insufficient balance")
-            return None
-
-        customer.wallet -= flight.price
-        payment = Payment(customer.username, flight.flight_id, flight.price)
-        self.payments.append(payment)
-        self.save_payments()
-        print(f"Payment successful: {flight.price} deducted from {customer.username}")
+        with self._lock:
+            self.table.save()
+
+    def make_payment(self, customer: Customer, flight: Flight, amount=None, ref=""):
+        # amount: the quoted fare (see pricing.py); defaults to the flight's base price.
+        # ref: the booking paid for, which is what a later refund looks up
+        amount = flight.price if amount is None else amount
+        with self._lock:
+            if self.balance(customer) < amount:
+                print("Insufficient balance")
+                return None
+
+            payment = Payment(customer.username, flight.flight_id, amount, ref)
+            self._add(payment, customer)
+        print(f"Payment successful: {amount} deducted from {customer.username}")
         return payment
 
+    def charge(self, customer: Customer, flight: Flight, amount, refs):
+        # one payment of `amount` per booking in refs, debited together and stored with one write
+        total = amount * len(refs)
+        with self._lock:
+            if self.balance(customer) < total:
+                print("Insufficient balance")
+                return None
+            payments = [Payment(customer.username, flight.flight_id, amount, ref) for ref in refs]
+            self._add_many(payments, customer)
+        print(f"Payment successful: {total} deducted from {customer.username}")
+        return payments
+
+    def payments_for(self, booking_id):
+        with self._lock:
+            return list(self._by_ref.get(booking_id, ()))
+
+    def paid_for(self, booking_id):
+        # net amount charged for a booking, refunds included
+        with self._lock:
+            return sum(p.amount for p in self._by_ref.get(booking_id, ()))
+
+    def refund(self, booking, customer=None):
+        # pays back whatever is still charged against the booking as one negative payment with the
+        # same ref; None when nothing was linked to it or it has been refunded already.
+        # the ledger is credited either way; customer: a logged-in Customer whose wallet to update
+        refunds = self.refund_many([booking], customer)
+        return refunds[0] if refunds else None
+
+    def refund_many(self, bookings, customer=None):
+        # refund() for many bookings (e.g. a cancelled flight's) written with one _add_many, so one
+        # payments append and one ledger post however many there are; returns the refund Payments
+        with self._lock:
+            refunds = []
+            for booking in bookings:
+                amount = self.paid_for(booking.booking_id)
+                if amount > 0:
+                    refunds.append(Payment(booking.customer_username, booking.flight_id, -amount,
+                                           booking.booking_id))
+            if refunds:
+                self._add_many(refunds, customer)
+        for p in refunds:
+            print(f"Refund issued: {-p.amount} returned to {p.customer_username}")
+        return refunds
+
     def list_payments(self, customer_username=None):
-        for p in self.payments:
-            if customer_username is None or p.customer_username == customer_username:
+        with self._lock:
+            payments = self.payments if customer_username is None else self._by_customer.get(customer_username, [])
+            for p in payments:
                 print(f"PaymentID: {p.payment_id} | FlightID: {p.flight_id} | Amount: {p.amount} | Date: {p.date}")
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+PRICE_TTL = float(os.environ.get("AIRLINE_PRICE_TTL", "60"))  # seconds before every fare is recomputed
+
+# fare = base price * load * urgency * demand, clipped to [MIN_FACTOR, MAX_FACTOR] * base price
+LOAD_WEIGHT = 0.6      # a full flight costs up to 60% more, rising with the square of the load factor
+URGENCY_WEIGHT = 0.5   # up to 50% more close to departure ...
+URGENCY_DAYS = 14.0    # ... decaying with this many days to go
+DEMAND_WEIGHT = 0.3    # route load factor above / below the network average
+MIN_FACTOR, MAX_FACTOR = 0.8, 2.5
+
+
+class PricingEngine:
+    # fares for every flight computed in one vectorized pass over column arrays (base price,
+    # seats, reserved, departure, route). a booking only recomputes the flights on its route,
+    # the whole table is recomputed once the TTL runs out (days to departure move on) or the
+    # set of flights changes. Flight.price stays the admin's base fare
+    def __init__(self, flight_manager, booking_manager, ttl=PRICE_TTL, clock=time.time):
+        self.flight_manager = flight_manager
+        self.booking_manager = booking_manager
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._stale = True        # flights added / edited / removed since the arrays were built
+        self._computed_at = None  # clock() of the last full pass
+        self._pos = {}            # flight_id -> row in the arrays
+        flight_manager.subscribe(self._on_flight_event)
+        booking_manager.subscribe(self._on_booking_event)
+
+    def close(self):
+        self.flight_manager.unsubscribe(self._on_flight_event)
+        self.booking_manager.unsubscribe(self._on_booking_event)
+
+    def _build(self):
+        flights = list(self.flight_manager.flights.values())
+        self._flights = flights
+        self._pos = {f.flight_id: i for i, f in enumerate(flights)}
+        self._base = np.array([f.price for f in flights], dtype=np.float64)
+        self._seats = np.array([max(len(f.seats), 1) for f in flights], dtype=np.float64)
+        self._reserved = np.array([f.seats.reserved_count for f in flights], dtype=np.float64)
+        self._departs = self._departures(flights)
+        routes = {}
+        self._route = np.array([routes.setdefault((f.origin, f.destination), len(routes)) for f in flights],
+                               dtype=np.int64)
+        order = np.argsort(self._route, kind="stable")
+        bounds = np.searchsorted(self._route[order], np.arange(len(routes) + 1))
+        self._members = [order[bounds[r]:bounds[r + 1]] for r in range(len(routes))]  # route -> rows
+        self._fares = self._base.copy()
+        self._stale = False
+
+    @staticmethod
+    def _departures(flights):
+        # epoch seconds; a flight whose date does not parse never gets an urgency premium
+        stamps = [f"{f.date}T{f.departure_time}" for f in flights]
+        try:
+            departs = np.array(stamps, dtype="datetime64[s]")
+        except ValueError:
+            departs = np.array([_parse(s) for s in stamps], dtype="datetime64[s]")
+        seconds = departs.astype(np.float64)
+        seconds[np.isnat(departs)] = np.inf
+        return seconds
+
+    def _full_pass(self, now):
+        self._route_reserved = np.bincount(self._route, weights=self._reserved, minlength=len(self._members))
+        self._route_seats = np.bincount(self._route, weights=self._seats, minlength=len(self._members))
+        self._mean_load = self._reserved.sum() / self._seats.sum() if len(self._seats) else 0.0
+        self._compute(slice(None), now)
+        self._computed_at = now
+
+    def _compute(self, rows, now):
+        base = self._base[rows]
+        route = self._route[rows]
+        load = self._reserved[rows] / self._seats[rows]
+        days = np.maximum((self._departs[rows] - now) / 86400.0, 0.0)
+        demand = self._route_reserved[route] / self._route_seats[route] - self._mean_load
+        fare = (base
+                * (1.0 + LOAD_WEIGHT * load ** 2)
+                * (1.0 + URGENCY_WEIGHT * np.exp(-days / URGENCY_DAYS))
+                * (1.0 + DEMAND_WEIGHT * demand))
+        self._fares[rows] = np.round(np.clip(fare, base * MIN_FACTOR, base * MAX_FACTOR), 2)
+
+    def _refresh(self):
+        # lock held
+        now = self.clock()
+        if self._stale:
+            self._build()
+            self._full_pass(now)
+        elif now - self._computed_at >= self.ttl:
+            self._full_pass(now)
+
+    def quote(self, flight_id):
+        # current fare, or None for an unknown flight
+        with self._lock:
+            self._refresh()
+            i = self._pos.get(flight_id)
+            return None if i is None else float(self._fares[i])
+
+    def quotes(self, flight_ids=None):
+        # flight_id -> fare for the given flights, or for all of them
+        with self._lock:
+            self._refresh()
+            if flight_ids is None:
+                return dict(zip(self._pos, self._fares.tolist()))
+            return {fid: float(self._fares[self._pos[fid]]) for fid in flight_ids if fid in self._pos}
+
+    def _on_flight_event(self, event, flight):
+        with self._lock:
+            self._stale = True
+
+    def _on_booking_event(self, event, booking):
+        with self._lock:
+            if event == "load":
+                self._stale = True
+                return
+            if self._stale or self._computed_at is None:
+                return  # the next quote rebuilds everything anyway
+            i = self._pos.get(booking.flight_id)
+            if i is None:
+                return
+            reserved = self._flights[i].seats.reserved_count
+            delta = reserved - self._reserved[i]
+            if not delta:
+                return
+            self._reserved[i] = reserved
+            route = self._route[i]
+            self._route_reserved[route] += delta
+            self._compute(self._members[route], self.clock())
+
+
+def _parse(stamp):
+    try:
+        return np.datetime64(stamp, "s")
+    except ValueError:
+        return np.datetime64("NaT")
@@ -0,0 +1,303 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from booking import BookingManager
+from customer import Customer, UserDirectory
+from flight import FlightManager
+from payment import PaymentManager
+from report import ReportManager
+from routes import RoutePlanner
+from ticket import TicketSystem
+
+DATA_FILES = ("flights.csv", "bookings.csv", "bookings.journal", "payments.csv", "users.csv", "admins.csv")
+DEFAULT_WALLET = 10000.0  # what the app gives a customer who has no wallet yet
+OPS = ("login", "search", "routes", "book", "pay", "cancel", "ticket", "report")
+
+# one JSON object per line, "op" plus that op's fields; lines without "op" are skipped
+#   {"op": "login", "email": "user1@example.com", "password": "password"}
+#   {"op": "search", "origin": "Cairo", "destination": "Paris", "date_from": "2027-01-01", "page": 1}
+#   {"op": "routes", "origin": "Cairo", "destination": "Lisbon", "optimize": "price"}
+#   {"op": "book", "customer": "user1@example.com", "flight_id": "...", "seat_no": "S3", "ref": "b1"}
+#   {"op": "pay", "customer": "user1@example.com", "flight_id": "...", "wallet": 500.0}
+#   {"op": "cancel", "booking_id": "..."} or {"op": "cancel", "ref": "b1"}
+#   {"op": "ticket", "booking_id": "..."} or {"op": "ticket", "ref": "b1"}
+#   {"op": "report"}
+# book without a seat_no takes the flight's next free seat; "ref" names a booking for later records
+
+
+def read_workload(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("op") in OPS:
+                records.append(record)
+    return records
+
+
+def percentile(sorted_values, p):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Replayer:
+    # runs workload records against real managers loaded from a data directory
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        path = lambda name: os.path.join(data_dir, name)
+        self.flight_mgr = FlightManager(path("flights.csv"))
+        self.booking_mgr = BookingManager(path("bookings.csv"))
+        self.payment_mgr = PaymentManager(path("payments.csv"))
+        self.flight_mgr.restore_reservations(self.booking_mgr)
+        self.ticket_sys = TicketSystem(self.booking_mgr, self.flight_mgr)
+        self.route_planner = RoutePlanner(self.flight_mgr)
+        self.report_mgr = ReportManager(path("users.csv"), path("admins.csv"), self.flight_mgr,
+                                        self.booking_mgr, self.payment_mgr)
+        self.users_file = path("users.csv")
+        self._refs = {}  # workload ref -> booking_id
+        self._customers = {}  # email -> Customer with a wallet
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.report_mgr.close()
+
+    def _customer(self, email, wallet=None):
+        with self._lock:
+            customer = self._customers.get(email)
+            if customer is None:
+                customer = self._customers[email] = Customer(email=email)
+                customer.username = email
+                customer.wallet = DEFAULT_WALLET
+            if wallet is not None:
+                customer.wallet = float(wallet)
+            return customer
+
+    def _booking_id(self, record):
+        if record.get("booking_id"):
+            return record["booking_id"]
+        with self._lock:
+            return self._refs.get(record.get("ref"))
+
+    def run(self, record):
+        # returns True when the operation succeeded the way the app would count it
+        op = record["op"]
+        if op == "login":
+            return Customer.login(record.get("email", ""), record.get("password", "")) is not None
+        if op == "search":
+            fields = ("origin", "destination", "date_from", "date_to", "min_price", "max_price",
+                      "sort_by", "page", "page_size")
+            self.flight_mgr.search(**{k: record[k] for k in fields if k in record})
+            return True
+        if op == "routes":
+            fields = ("depart_after", "depart_before", "max_connections", "optimize", "limit")
+            self.route_planner.plan(record["origin"], record["destination"],
+                                    **{k: record[k] for k in fields if k in record})
+            return True
+        if op == "book":
+            flight = self.flight_mgr.flights.get(record.get("flight_id"))
+            if not flight:
+                return False
+            seat_no = record.get("seat_no") or flight.seats.next_free()
+            booking = self.booking_mgr.create_booking(record.get("customer", "guest"), self.flight_mgr,
+                                                      flight.flight_id, seat_no) if seat_no else None
+            if booking and record.get("ref"):
+                with self._lock:
+                    self._refs[record["ref"]] = booking.booking_id
+            return booking is not None
+        if op == "pay":
+            flight = self.flight_mgr.flights.get(record.get("flight_id"))
+            if not flight:
+                return False
+            customer = self._customer(record.get("customer", "guest"), record.get("wallet"))
+            return self.payment_mgr.make_payment(customer, flight) is not None
+        if op == "cancel":
+            booking_id = self._booking_id(record)
+            return bool(booking_id) and self.booking_mgr.cancel_booking(booking_id, self.flight_mgr) is not None
+        if op == "ticket":
+            booking_id = self._booking_id(record)
+            self.ticket_sys.print_ticket(booking_id)
+            return self.booking_mgr.get_booking(booking_id) is not None
+        if op == "report":
+            self.report_mgr.generate_report()
+            return True
+        raise ValueError(f"unknown op {op!r}")
+
+
+def replay(records, data_dir, concurrency=8):
+    # every record is timed on its own; the pool keeps `concurrency` of them in flight at once
+    saved_filename = Customer.FILENAME
+    latencies = {}
+    failed = {}
+    errors = {}
+    stats_lock = threading.Lock()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        replayer = Replayer(data_dir)
+        Customer.FILENAME = replayer.users_file
+
+        def timed(record):
+            started = time.perf_counter()
+            try:
+                ok = replayer.run(record)
+                error = None
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - started
+            op = record["op"]
+            with stats_lock:
+                latencies.setdefault(op, []).append(elapsed)
+                if not ok:
+                    failed[op] = failed.get(op, 0) + 1
+                if error:
+                    errors.setdefault(op, []).append(error)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(timed, records))
+            elapsed = time.perf_counter() - started
+        finally:
+            Customer.FILENAME = saved_filename
+            replayer.close()
+
+    per_op = {}
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        per_op[op] = {
+            "count": len(values),
+            "failed": failed.get(op, 0),
+            "errors": len(errors.get(op, [])),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+        }
+    return {
+        "records": len(records),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "ops_per_second": round(len(records) / elapsed, 1) if elapsed else None,
+        "ops": per_op,
+        "first_errors": {op: messages[:3] for op, messages in errors.items()},
+    }
+
+
+def synthesize(data_dir, count, seed=0):
+    # a workload shaped like app traffic (mostly searches and logins) over the ids in data_dir
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        flights = list(FlightManager(os.path.join(data_dir, "flights.csv")).flights.values())
+    if not flights:
+        raise ValueError(f"no flights in {data_dir}")
+    directory = UserDirectory(os.path.join(data_dir, "users.csv"))
+    directory.refresh()
+    emails = [row["email"] for row in directory.by_email.values()] or ["guest@example.com"]
+    mix = [("search", 40), ("login", 20), ("book", 15), ("pay", 10), ("ticket", 6), ("cancel", 5),
+           ("routes", 3), ("report", 1)]
+    ops, weights = zip(*mix)
+    records = []
+    refs = []
+    for n in range(count):
+        op = rng.choices(ops, weights)[0]
+        flight = rng.choice(flights)
+        email = rng.choice(emails)
+        if op == "search":
+            records.append({"op": op, "origin": flight.origin, "destination": flight.destination})
+        elif op == "login":
+            records.append({"op": op, "email": email, "password": "password"})
+        elif op == "book":
+            refs.append(f"b{n}")
+            records.append({"op": op, "customer": email, "flight_id": flight.flight_id, "ref": refs[-1]})
+        elif op == "pay":
+            records.append({"op": op, "customer": email, "flight_id": flight.flight_id})
+        elif op in ("ticket", "cancel"):
+            if not refs:
+                continue
+            ref = rng.choice(refs)
+            if op == "cancel":
+                refs.remove(ref)
+            records.append({"op": op, "ref": ref})
+        elif op == "routes":
+            records.append({"op": op, "origin": flight.origin, "destination": rng.choice(flights).destination})
+        else:
+            records.append({"op": op})
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded JSONL workload against the managers")
+    parser.add_argument("workload", nargs="?", default="requests.jsonl")
+    parser.add_argument("--data", default=".", help="directory holding the csv files to replay against")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--in-place", action="store_true",
+                        help="write to the data directory instead of a scratch copy of it")
+    parser.add_argument("--synthesize", type=int, metavar="N",
+                        help="write N synthetic records to the workload file instead of replaying")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--metrics", help="collect per-method metrics and write them here in Prometheus format")
+    args = parser.parse_args(argv)
+    if args.metrics or metrics.ENABLED:
+        metrics.enable()
+
+    if args.synthesize:
+        records = synthesize(args.data, args.synthesize, args.seed)
+        with open(args.workload, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        print(f"{len(records)} records written to {args.workload}")
+        return 0
+
+    records = read_workload(args.workload)
+    if not records:
+        print(f"No replayable records in {args.workload}")
+        return 1
+
+    if args.in_place:
+        result = replay(records, args.data, args.concurrency)
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            for name in DATA_FILES:
+                if os.path.exists(os.path.join(args.data, name)):
+                    shutil.copy2(os.path.join(args.data, name), scratch)
+            result = replay(records, scratch, args.concurrency)
+
+    print(f"{result['records']} records, concurrency {result['concurrency']}: "
+          f"{result['seconds']}s, {result['ops_per_second']} ops/s")
+    print(f"{'op':<8} {'count':>7} {'failed':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for op, s in result["ops"].items():
+        print(f"{op:<8} {s['count']:>7} {s['failed']:>7} {s['errors']:>7} "
+              f"{s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f}")
+    for op, messages in result["first_errors"].items():
+        print(f"{op} errors: {'; '.join(messages)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,125 @@
-import csv
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from admin import AdminManager
+from archive import ARCHIVE_DIR, ArchiveReader
+from customer import user_directory
 from flight import FlightManager
 from booking import BookingManager
+from payment import PaymentManager
 
 class ReportManager:
+    # counters are built once and then kept current by the managers' events, so a report
+    # reads them instead of rescanning files; recompute() / verify() rebuild them from scratch
     def __init__(self, user_file="users.csv", admin_file="admins.csv",
-                 flight_manager: FlightManager = None, booking_manager: BookingManager = None):
+                 flight_manager: FlightManager = None, booking_manager: BookingManager = None,
+                 payment_manager: PaymentManager = None, admin_manager: AdminManager = None,
+                 archive_dir=ARCHIVE_DIR):
         self.user_file = user_file
         self.admin_file = admin_file
         self.flight_manager = flight_manager
         self.booking_manager = booking_manager
+        self.payment_manager = payment_manager
+        self.admin_manager = admin_manager or AdminManager(admin_file)
+        self.user_directory = user_directory(user_file)
+        self.archive = ArchiveReader(archive_dir)  # partitions are only read when an archive report asks
+        self._lock = threading.RLock()
+
+        self.roles = Counter()               # role -> users
+        self.bookings_by_flight = Counter()  # flight_id -> bookings
+        self.revenue_by_flight = Counter()   # flight_id -> amount paid
+
+        self.user_directory.subscribe(self._on_user_event)
+        if self.booking_manager:
+            self.booking_manager.subscribe(self._on_booking_event)
+        if self.payment_manager:
+            self.payment_manager.subscribe(self._on_payment_event)
+        self.recompute()
+
+    def close(self):
+        self.user_directory.unsubscribe(self._on_user_event)
+        if self.booking_manager:
+            self.booking_manager.unsubscribe(self._on_booking_event)
+        if self.payment_manager:
+            self.payment_manager.unsubscribe(self._on_payment_event)
+
+    def _on_user_event(self, event, row):
+        with self._lock:
+            if event == "load":
+                self.roles = self._count_roles()
+            elif event == "add":
+                self.roles[row["role"]] += 1
+
+    def _on_booking_event(self, event, booking):
+        with self._lock:
+            if event == "load":
+                self.bookings_by_flight = self._count_bookings()
+            elif event == "add":
+                self.bookings_by_flight[booking.flight_id] += 1
+            elif event == "cancel":
+                self.bookings_by_flight[booking.flight_id] -= 1
+                if not self.bookings_by_flight[booking.flight_id]:
+                    del self.bookings_by_flight[booking.flight_id]
+
+    def _on_payment_event(self, event, payment):
+        with self._lock:
+            if event == "load":
+                self.revenue_by_flight = self._sum_revenue()
+            elif event == "add":
+                self.revenue_by_flight[payment.flight_id] += payment.amount
+
+    def _count_roles(self):
+        return Counter(row["role"] for row in self.user_directory.by_email.values())
+
+    def _count_bookings(self):
+        if not self.booking_manager:
+            return Counter()
+        return Counter(b.flight_id for b in self.booking_manager.bookings)
+
+    def _sum_revenue(self):
+        revenue = Counter()
+        if self.payment_manager:
+            for p in self.payment_manager.payments:
+                revenue[p.flight_id] += p.amount
+        return revenue
+
+    @contextmanager
+    def _locked(self):
+        # take the managers' locks before ours, the same order their events arrive in
+        with ExitStack() as stack:
+            for owner in (self.user_directory, self.booking_manager, self.payment_manager):
+                if owner:
+                    stack.enter_context(owner._lock)
+            stack.enter_context(self._lock)
+            yield
+
+    def recompute(self):
+        with self._locked():
+            self.user_directory.refresh()
+            self.roles = self._count_roles()
+            self.bookings_by_flight = self._count_bookings()
+            self.revenue_by_flight = self._sum_revenue()
+
+    def verify(self):
+        # returns a list of counters that drifted from the underlying data, empty when consistent
+        problems = []
+        with self._locked():
+            self.user_directory.refresh()
+            for name, kept, actual in (("roles", self.roles, self._count_roles()),
+                                       ("bookings_by_flight", self.bookings_by_flight, self._count_bookings()),
+                                       ("revenue_by_flight", self.revenue_by_flight, self._sum_revenue())):
+                for key in set(kept) | set(actual):
+                    if abs(kept.get(key, 0) - actual.get(key, 0)) > 1e-6:
+                        problems.append(f"{name}[{key}]: kept {kept.get(key, 0)}, actual {actual.get(key, 0)}")
+        return problems
 
     def load_customers_count(self):
-        try:
-            with open(self.user_file, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                count = sum(1 for row in reader if row["role"] == "customer")
-                return count
-        except FileNotFoundError:
-            return 0
+        self.user_directory.refresh()  # cheap stat, picks up edits made outside this process
+        return self.roles["customer"]
 
     def load_admins_count(self):
-        try:
-            with open(self.admin_file, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                count = sum(1 for row in reader)
-                return count
-        except FileNotFoundError:
-            return 0
+        return len(self.admin_manager.admins)
 
     def flights_count(self):
         if not self.flight_manager:
@@ -36,17 +129,30 @@ class ReportManager:
     def bookings_count(self):
         if not self.booking_manager:
             return 0
-        return len(self.booking_manager.bookings)
+        return self.booking_manager.count()
 
     def bookings_per_flight(self):
         if not self.flight_manager or not self.booking_manager:
             return {}
+        return {f.flight_number: self.bookings_by_flight[flight_id]
+                for flight_id, f in self.flight_manager.flights.items()}
+
+    def revenue_per_flight(self):
+        if not self.flight_manager or not self.payment_manager:
+            return {}
+        return {f.flight_number: self.revenue_by_flight[flight_id]
+                for flight_id, f in self.flight_manager.flights.items()}
+
+    def archive_summary(self, from_month=None, to_month=None):
+        return self.archive.summary(from_month, to_month)
 
-        result = {}
-        for flight_id, flight in self.flight_manager.flights.items():
-            count = sum(1 for b in self.booking_manager.bookings if b.flight_id == flight_id)
-            result[flight.flight_number] = count
-        return result
+    def archived_revenue_per_flight(self, from_month=None, to_month=None):
+        numbers = {row["flight_id"]: row["flight_number"]
+                   for row in self.archive.rows("flights", from_month, to_month)}
+        revenue = Counter()
+        for row in self.archive.rows("payments", from_month, to_month):
+            revenue[numbers.get(row["flight_id"], row["flight_id"])] += float(row["amount"] or 0)
+        return dict(revenue)
 
     def generate_report(self):
         print("===== SYSTEM REPORT =====")
@@ -57,4 +163,8 @@ class ReportManager:
         print("\nBookings per Flight:")
         for flight_number, count in self.bookings_per_flight().items():
             print(f"Flight {flight_number}: {count} bookings")
+        if self.payment_manager:
+            print("\nRevenue per Flight:")
+            for flight_number, amount in self.revenue_per_flight().items():
+                print(f"Flight {flight_number}: {amount}")
         print("=========================")
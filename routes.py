@@ -0,0 +1,170 @@
+import bisect
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from flight import FlightManager
+
+MIN_LAYOVER = timedelta(minutes=45)
+MAX_LAYOVER = timedelta(hours=24)  # connections further apart than this are not considered
+
+
+def parse_departure(flight):
+    try:
+        return datetime.fromisoformat(f"{flight.date} {flight.departure_time}")
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_duration(value):
+    # "HH:MM:SS" or "HH:MM", the formats flights.csv and the admin form produce
+    try:
+        parts = [int(p) for p in str(value).split(":")]
+    except ValueError:
+        return None
+    if len(parts) == 2:
+        parts.append(0)
+    if len(parts) != 3:
+        return None
+    return timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+
+
+class Itinerary:
+    def __init__(self, flights, legs):
+        self.flights = flights  # Flight objects in travel order
+        self.departure = legs[0][2]
+        self.arrival = legs[-1][3]
+        self.price = sum(leg[4] for leg in legs)
+
+    @property
+    def duration(self):
+        return self.arrival - self.departure
+
+    @property
+    def connections(self):
+        return len(self.flights) - 1
+
+    def __repr__(self):
+        route = " -> ".join([self.flights[0].origin] + [f.destination for f in self.flights])
+        return f"<Itinerary {route} | {self.price} | {self.duration}>"
+
+
+class RoutePlanner:
+    # time-expanded graph over the schedule: every flight is a node, and a flight connects to every
+    # flight leaving its destination between arrival + min_layover and arrival + MAX_LAYOVER.
+    # edges are never materialized, each airport keeps its departures sorted and plan() bisects them.
+    # the per-airport lists follow FlightManager's add / edit / delete events
+    def __init__(self, flight_manager: FlightManager, min_layover=MIN_LAYOVER):
+        self.flight_manager = flight_manager
+        self.min_layover = min_layover
+        self._lock = threading.RLock()
+        self._departures = {}  # airport -> sorted [(departure, flight_id)]
+        self._legs = {}        # flight_id -> (origin, destination, departure, arrival, price)
+        self.rebuild()
+        flight_manager.subscribe(self._on_flight_event)
+
+    def rebuild(self):
+        with self._lock:
+            self._departures, self._legs = {}, {}
+            for f in self.flight_manager.flights.values():
+                leg = self._leg(f)
+                if leg:
+                    self._legs[f.flight_id] = leg
+                    self._departures.setdefault(leg[0], []).append((leg[2], f.flight_id))
+            for departures in self._departures.values():
+                departures.sort()
+
+    def _leg(self, f):
+        departure = parse_departure(f)
+        duration = parse_duration(f.duration)
+        if departure is None or duration is None:
+            return None  # flights without a usable schedule can't be part of an itinerary
+        return (f.origin.strip().lower(), f.destination.strip().lower(), departure,
+                departure + duration, float(f.price))
+
+    def _add(self, f):
+        leg = self._leg(f)
+        if leg:
+            self._legs[f.flight_id] = leg
+            bisect.insort(self._departures.setdefault(leg[0], []), (leg[2], f.flight_id))
+
+    def _remove(self, flight_id):
+        leg = self._legs.pop(flight_id, None)
+        if leg is None:
+            return
+        departures = self._departures[leg[0]]
+        del departures[bisect.bisect_left(departures, (leg[2], flight_id))]
+        if not departures:
+            del self._departures[leg[0]]
+
+    def _on_flight_event(self, event, flight):
+        with self._lock:
+            if event == "load":
+                self.rebuild()
+            elif event in ("add", "edit"):
+                self._remove(flight.flight_id)
+                self._add(flight)
+            elif event == "delete":
+                self._remove(flight.flight_id)
+
+    def plan(self, origin, destination, depart_after=None, depart_before=None, max_connections=2,
+             min_layover=None, optimize="price", limit=5):
+        # k-shortest itineraries: each flight node may be settled up to `limit` times.
+        # optimize="price" sums fares, optimize="duration" uses first departure to last arrival;
+        # both only grow along a path, so Dijkstra's settle order holds
+        if optimize not in ("price", "duration"):
+            raise ValueError("optimize must be 'price' or 'duration'")
+        origin, destination = origin.strip().lower(), destination.strip().lower()
+        min_layover = self.min_layover if min_layover is None else min_layover
+        if isinstance(depart_after, str):
+            depart_after = datetime.fromisoformat(depart_after)
+        if isinstance(depart_before, str):
+            depart_before = datetime.fromisoformat(depart_before)
+
+        with self._lock:
+            legs = self._legs
+            heap = []
+            seq = 0
+
+            def cost(path):
+                if optimize == "price":
+                    return sum(legs[fid][4] for fid in path)
+                return legs[path[-1]][3] - legs[path[0]][2]
+
+            starts = self._departures.get(origin, [])
+            lo = bisect.bisect_left(starts, (depart_after,)) if depart_after else 0
+            hi = bisect.bisect_right(starts, (depart_before, "\uffff")) if depart_before else len(starts)
+            for _, fid in starts[lo:hi]:
+                heapq.heappush(heap, (cost((fid,)), seq, (fid,)))
+                seq += 1
+
+            settled = {}
+            found = []
+            while heap and len(found) < limit:
+                _, _, path = heapq.heappop(heap)
+                last = path[-1]
+                if settled.get(last, 0) >= limit:
+                    continue
+                settled[last] = settled.get(last, 0) + 1
+
+                here, arrival = legs[last][1], legs[last][3]
+                if here == destination:
+                    found.append(path)
+                    continue
+                if len(path) > max_connections:
+                    continue
+
+                visited = {legs[fid][0] for fid in path}
+                departures = self._departures.get(here, [])
+                lo = bisect.bisect_left(departures, (arrival + min_layover,))
+                hi = bisect.bisect_right(departures, (arrival + MAX_LAYOVER, "\uffff"))
+                for _, fid in departures[lo:hi]:
+                    if legs[fid][1] in visited:
+                        continue  # never fly back into an airport already on the path
+                    next_path = path + (fid,)
+                    heapq.heappush(heap, (cost(next_path), seq, next_path))
+                    seq += 1
+
+            flights = self.flight_manager.flights
+            return [Itinerary([flights[fid] for fid in path], [legs[fid] for fid in path])
+                    for path in found if all(fid in flights for fid in path)]
@@ -0,0 +1,114 @@
+from flight import SEATS_PER_ROW
+
+SEAT_LETTERS = "ABCDEF"
+
+# column masks over a row (bit 0 is seat A)
+POSITIONS = {
+    "any": 0b111111,
+    "window": 0b100001,
+    "middle": 0b010010,
+    "aisle": 0b001100,
+}
+
+
+def seat_label(seat_no):
+    # "S8" -> "2B"
+    row, column = divmod(int(seat_no[1:]) - 1, SEATS_PER_ROW)
+    return f"{row + 1}{SEAT_LETTERS[column]}"
+
+
+class SeatingEngine:
+    # picks seats for the customer instead of the caller naming one. a position preference is
+    # honoured seat by seat, for groups too (seats of one kind are never side by side); without
+    # one, groups are seated side by side in one row when any row has room and otherwise split
+    # into the largest blocks left. everything runs on the seat map's per-row free masks, so no
+    # booking walks the individual seats
+    def __init__(self, flight_manager, booking_manager):
+        self.flight_manager = flight_manager
+        self.booking_manager = booking_manager
+
+    def allocate(self, flight_id, count=1, position="any", rows=None, strict=False):
+        # reserves `count` seats and returns their numbers, or None if they cannot all be had.
+        # rows is an inclusive, 1-based (first, last) range; unless strict, a preference that
+        # cannot be met falls back to any free seats on the flight
+        if position not in POSITIONS:
+            raise ValueError(f"position must be one of {', '.join(POSITIONS)}")
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            print("Flight not found")
+            return None
+        with self.flight_manager.lock_for(flight_id):
+            return self.allocate_locked(flight, count, position, rows, strict)
+
+    def allocate_locked(self, flight, count=1, position="any", rows=None, strict=False):
+        # allocate() for a caller already holding the flight's lock
+        seats = flight.seats
+        first, last = (rows[0] - 1, rows[1] - 1) if rows else (0, None)
+        if count < 1 or seats.free_count() < count:
+            print("Not enough free seats")
+            return None
+        picked = self._pick(seats, count, POSITIONS[position], first, last)
+        if picked is None and not strict:
+            picked = self._pick(seats, count, POSITIONS["any"], 0, None)
+        if picked is None:
+            print("No seats match the preference")
+        return picked
+
+    def _pick(self, seats, count, columns, first, last):
+        # reserves as it goes, so each block sees the ones before it as taken
+        picked = []
+        if count == 1 or columns != POSITIONS["any"]:
+            while len(picked) < count:
+                seat_no = seats.next_free_in(columns, first, last)
+                if seat_no is None:
+                    break
+                seats.reserve(seat_no)
+                picked.append(seat_no)
+        else:
+            self._pick_blocks(seats, count, first, last, picked)
+        if len(picked) < count:
+            for seat_no in picked:
+                seats.release(seat_no)
+            return None
+        return picked
+
+    def _pick_blocks(self, seats, count, first, last, picked):
+        # largest side-by-side blocks first, appended to `picked`
+        size = min(count, SEATS_PER_ROW)
+        while size and len(picked) < count:
+            block = seats.free_block(size, first, last)
+            if block is None:
+                size -= 1
+                continue
+            for seat_no in block:
+                seats.reserve(seat_no)
+            picked += block
+            size = min(size, count - len(picked))
+
+    def release(self, flight_id, seat_nos):
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            return
+        with self.flight_manager.lock_for(flight_id):
+            for seat_no in seat_nos:
+                flight.seats.release(seat_no)
+
+    def book(self, customer_username, flight_id, count=1, position="any", rows=None, strict=False):
+        # allocates and books in one step under the flight lock (the same flight-then-booking lock
+        # order as BookingManager.create_booking); returns the new Bookings or None
+        if position not in POSITIONS:
+            raise ValueError(f"position must be one of {', '.join(POSITIONS)}")
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            print("Flight not found")
+            return None
+        with self.flight_manager.lock_for(flight_id):
+            seat_nos = self.allocate_locked(flight, count, position, rows, strict)
+            if seat_nos is None:
+                return None
+            try:
+                return self.booking_manager.book_reserved(customer_username, flight_id, seat_nos)
+            except Exception:
+                for seat_no in seat_nos:
+                    flight.seats.release(seat_no)
+                raise
@@ -0,0 +1,426 @@
+import argparse
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import storage
+from customer import Customer
+from ledger import OPENING_BALANCE
+from seating import POSITIONS, seat_label
+from services import Services
+from storage import DEFAULT_FILES
+
+WORKERS = int(os.environ.get("AIRLINE_API_WORKERS", "16"))       # connections served at once
+QUEUE_SIZE = int(os.environ.get("AIRLINE_API_QUEUE", "64"))      # accepted connections waiting for a worker
+IDLE_TIMEOUT = float(os.environ.get("AIRLINE_API_IDLE_TIMEOUT", "5"))  # seconds a keep-alive connection may idle
+MAX_SESSIONS = 100000  # login tokens kept; the oldest half is dropped beyond this
+MAX_PAGE_SIZE = 100
+
+_BUSY_BODY = b'{"error": "server busy"}'
+BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: %d\r\nRetry-After: 1\r\nConnection: close\r\n\r\n%s"
+                 % (len(_BUSY_BODY), _BUSY_BODY))
+
+# endpoints (JSON in and out; the ones marked * want "Authorization: Bearer <token>" from /login)
+#   POST /register        {"name", "email", "password"}
+#   POST /login           {"email", "password"} or {"username", "password", "admin": true} -> token
+#   GET  /flights         ?origin&destination&date_from&date_to&min_price&max_price&sort_by&page&page_size
+#   POST /checkout      * {"flight_id", "count", "position"}; an Idempotency-Key header makes retries safe
+#   GET  /bookings      * the customer's bookings
+#   POST /bookings/<id>/cancel * the customer's own booking, or any booking for an admin
+#   GET  /tickets/<id>  *
+#   GET  /payments      * ?page&page_size, newest first, with the balance
+#   GET  /reports       * admins only
+#   GET  /health          worker pool and queue state
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Api:
+    # the endpoints above over one shared Services; every method returns (status, JSON-able payload)
+    def __init__(self, services):
+        self.services = services
+        self._sessions = {}  # token -> Customer or Admin, oldest first
+        self._lock = threading.Lock()
+        self.routes = {
+            ("POST", "register"): self.register,
+            ("POST", "login"): self.login,
+            ("GET", "flights"): self.flights,
+            ("POST", "checkout"): self.checkout,
+            ("GET", "bookings"): self.bookings,
+            ("POST", "cancel"): self.cancel,
+            ("GET", "tickets"): self.ticket,
+            ("GET", "payments"): self.payments,
+            ("GET", "reports"): self.reports,
+        }
+
+    def warm_up(self):
+        # loads every manager now rather than inside the first requests
+        s = self.services
+        for name in ("flight_mgr", "booking_mgr", "payment_mgr", "checkout", "waitlist", "ticket_sys",
+                     "report_mgr", "admin_mgr"):
+            getattr(s, name)
+
+    def handle(self, method, path, query, body, headers):
+        parts = [p for p in path.split("/") if p]
+        if len(parts) == 3 and parts[0] == "bookings" and parts[2] == "cancel":
+            name, arg = "cancel", parts[1]
+        elif len(parts) == 2 and parts[0] == "tickets":
+            name, arg = "tickets", parts[1]
+        elif len(parts) == 1:
+            name, arg = parts[0], None
+        else:
+            raise ApiError(404, "not found")
+        route = self.routes.get((method, name))
+        if route is None:
+            if any(n == name for _, n in self.routes):
+                raise ApiError(405, "method not allowed")
+            raise ApiError(404, "not found")
+        request = {"query": query, "body": body, "headers": headers}
+        return route(request, arg) if arg is not None else route(request)
+
+    def _session(self, request, admin=False):
+        auth = request["headers"].get("Authorization", "")
+        user = self._sessions.get(auth[7:]) if auth.startswith("Bearer ") else None
+        if user is None:
+            raise ApiError(401, "login required")
+        if admin and not self._is_admin(user):
+            raise ApiError(403, "administrators only")
+        return user
+
+    @staticmethod
+    def _is_admin(user):
+        return getattr(user, "role", None) == "admin"
+
+    def _start_session(self, user):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sessions[token] = user
+            if len(self._sessions) > MAX_SESSIONS:
+                for old in list(self._sessions)[:len(self._sessions) // 2]:
+                    del self._sessions[old]
+        return token
+
+    @staticmethod
+    def _field(body, name):
+        value = body.get(name)
+        if not isinstance(value, str) or not value:
+            raise ApiError(400, f"{name} is required")
+        return value
+
+    def register(self, request):
+        body = request["body"]
+        name, email, password = (self._field(body, f) for f in ("name", "email", "password"))
+        if Customer.name_exists(name):
+            raise ApiError(409, "name already registered")
+        if not Customer.register(name, email, password):
+            raise ApiError(409, "email already registered")
+        return 201, {"name": name, "email": email}
+
+    def login(self, request):
+        body = request["body"]
+        password = self._field(body, "password")
+        if body.get("admin"):
+            user = self.services.admin_mgr.login(self._field(body, "username"), password)
+            if user is None:
+                raise ApiError(401, "invalid administrator credentials")
+            user.role = "admin"
+            return 200, {"token": self._start_session(user), "role": "admin", "name": user.name}
+        user = Customer.login(self._field(body, "email"), password)
+        if user is None:
+            raise ApiError(401, "wrong email or password")
+        user.username = user.email
+        balance = self.services.payment_mgr.open_account(user, OPENING_BALANCE)
+        return 200, {"token": self._start_session(user), "role": "customer", "name": user.name,
+                     "balance": balance}
+
+    def flights(self, request):
+        q = request["query"]
+        try:
+            page = self.services.flight_mgr.search(
+                origin=q.get("origin"),
+                destination=q.get("destination"),
+                date_from=q.get("date_from"),
+                date_to=q.get("date_to"),
+                min_price=float(q["min_price"]) if q.get("min_price") else None,
+                max_price=float(q["max_price"]) if q.get("max_price") else None,
+                sort_by=q.get("sort_by", "departure"),
+                page=int(q.get("page", 1)),
+                page_size=max(1, min(int(q.get("page_size", 20)), MAX_PAGE_SIZE)),
+            )
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        fares = self.services.pricing.quotes([f.flight_id for f in page])
+        return 200, {
+            "total": page.total,
+            "page": page.page,
+            "pages": page.pages,
+            "flights": [{"flight_id": f.flight_id, "flight_number": f.flight_number, "airline": f.airline,
+                         "origin": f.origin, "destination": f.destination, "date": f.date,
+                         "departure_time": f.departure_time, "duration": f.duration, "base_price": f.price,
+                         "fare": fares.get(f.flight_id, f.price), "free_seats": f.seats.free_count()}
+                        for f in page],
+        }
+
+    @staticmethod
+    def _booking(b):
+        return {"booking_id": b.booking_id, "flight_id": b.flight_id, "seat_no": b.seat_no,
+                "seat": seat_label(b.seat_no), "date": b.date}
+
+    def checkout(self, request):
+        customer = self._session(request)
+        if self._is_admin(customer):
+            raise ApiError(403, "customers only")
+        body = request["body"]
+        flight_id = self._field(body, "flight_id")
+        position = body.get("position", "any")
+        if position not in POSITIONS:
+            raise ApiError(400, f"position must be one of {', '.join(POSITIONS)}")
+        try:
+            count = int(body.get("count", 1))
+        except (TypeError, ValueError):
+            raise ApiError(400, "count must be a number")
+        if not 1 <= count <= 9:
+            raise ApiError(400, "count must be between 1 and 9")
+        # keys are per customer, so two customers picking the same key never share a receipt
+        key = request["headers"].get("Idempotency-Key")
+        key = f"{customer.username}:{key}" if key else None
+
+        s = self.services
+        receipt = s.checkout.checkout(customer, flight_id, count=count, position=position, key=key)
+        if receipt is None:
+            if flight_id not in s.flight_mgr.flights:
+                raise ApiError(404, "flight not found")
+            fare = s.pricing.quote(flight_id)
+            if s.payment_mgr.balance(customer) < fare * count:
+                raise ApiError(402, "insufficient funds")
+            raise ApiError(409, "not enough seats left on this flight")
+        return 200 if receipt.replayed else 201, {
+            "bookings": [self._booking(b) for b in receipt.bookings],
+            "total": receipt.total,
+            "replayed": receipt.replayed,
+            "balance": s.payment_mgr.balance(customer),
+        }
+
+    def bookings(self, request):
+        customer = self._session(request)
+        bookings = self.services.booking_mgr.bookings_for_customer(customer.username)
+        return 200, {"bookings": [self._booking(b) for b in bookings]}
+
+    def _own_booking(self, user, booking_id):
+        booking = self.services.booking_mgr.get_booking(booking_id)
+        # someone else's booking answers the same as a missing one
+        if booking is None or (not self._is_admin(user) and booking.customer_username != user.username):
+            raise ApiError(404, "booking not found")
+        return booking
+
+    def cancel(self, request, booking_id):
+        user = self._session(request)
+        self._own_booking(user, booking_id)
+        s = self.services
+        paid = s.payment_mgr.paid_for(booking_id)
+        booking = s.booking_mgr.cancel_booking(booking_id, s.flight_mgr, s.payment_mgr,
+                                               None if self._is_admin(user) else user)
+        if booking is None:
+            raise ApiError(404, "booking not found")  # cancelled by a concurrent request
+        return 200, {"booking": self._booking(booking), "refunded": paid}
+
+    def ticket(self, request, booking_id):
+        user = self._session(request)
+        self._own_booking(user, booking_id)
+        ticket = self.services.ticket_sys.ticket(booking_id)
+        if ticket is None:
+            raise ApiError(404, "ticket not found")
+        return 200, ticket
+
+    def payments(self, request):
+        customer = self._session(request)
+        q = request["query"]
+        try:
+            page = int(q.get("page", 1))
+            page_size = max(1, min(int(q.get("page_size", 10)), MAX_PAGE_SIZE))
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        history = self.services.payment_mgr.history(customer.username, page=page, page_size=page_size)
+        return 200, {
+            "balance": self.services.payment_mgr.balance(customer),
+            "total": history.total,
+            "page": history.page,
+            "pages": history.pages,
+            "payments": [{"payment_id": p.payment_id, "flight_id": p.flight_id, "amount": p.amount,
+                          "date": p.date, "ref": p.ref} for p in history],
+        }
+
+    def reports(self, request):
+        self._session(request, admin=True)
+        rep = self.services.report_mgr
+        return 200, {
+            "customers": rep.load_customers_count(),
+            "admins": rep.load_admins_count(),
+            "flights": rep.flights_count(),
+            "bookings": rep.bookings_count(),
+            "bookings_per_flight": rep.bookings_per_flight(),
+            "revenue_per_flight": rep.revenue_per_flight(),
+        }
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection carries many requests
+    server_version = "AirlineAPI/1.0"
+    timeout = IDLE_TIMEOUT
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if url.path == "/health":
+                status, payload = 200, self.server.health()
+            else:
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    raise ApiError(400, "body is not valid JSON")
+                if not isinstance(body, dict):
+                    raise ApiError(400, "body must be a JSON object")
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                status, payload = self.server.api.handle(method, url.path, query, body, self.headers)
+        except ApiError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            status, payload = 500, {"error": "internal error"}
+        self._send(status, payload)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PoolHTTPServer(HTTPServer):
+    # accepted connections wait in a bounded queue for one of `workers` threads. a worker serves its
+    # connection until the client closes it or it idles for IDLE_TIMEOUT, so a client should keep
+    # at most `workers` connections open. once the queue is full a new connection gets an immediate
+    # 503 instead of waiting behind it
+    request_queue_size = 128  # listen backlog
+
+    def __init__(self, address, services, workers=WORKERS, queue_size=QUEUE_SIZE, verbose=False):
+        super().__init__(address, ApiHandler)
+        self.api = Api(services)
+        self.verbose = verbose
+        self.rejected = 0
+        self._busy = 0
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue(queue_size)
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        # runs on the accepting thread; never blocks on a busy pool
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            self._reject(request)
+
+    def _reject(self, request):
+        try:
+            request.setblocking(False)
+            try:
+                request.recv(65536)  # unread request bytes would turn the close into a reset
+            except OSError:
+                pass
+            request.sendall(BUSY_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._stats_lock:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._stats_lock:
+                    self._busy -= 1
+
+    def health(self):
+        with self._stats_lock:
+            return {"status": "ok", "workers": len(self._workers), "busy": self._busy,
+                    "queued": self._queue.qsize(), "queue_size": self._queue.maxsize, "rejected": self.rejected}
+
+    def handle_error(self, request, client_address):
+        if self.verbose:
+            super().handle_error(request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._queue.put(None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the airline managers as a JSON API over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default="", help="directory holding the data files (default: current)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="connections allowed to wait for a worker")
+    parser.add_argument("--verbose", action="store_true", help="log requests and keep the managers' messages")
+    args = parser.parse_args(argv)
+
+    services = Services(args.data)
+    Customer.FILENAME = os.path.join(args.data, DEFAULT_FILES["users"])
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")  # the managers print on every call
+    server = PoolHTTPServer((args.host, args.port), services, args.workers, args.queue, args.verbose)
+    server.api.warm_up()
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} workers, queue {args.queue})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        storage.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
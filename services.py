@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+
+import metrics
+import storage
+from admin import AdminManager
+from archive import ARCHIVE_DIR
+from booking import BookingManager
+from checkout import CheckoutManager
+from flight import FlightManager
+from payment import PaymentManager
+from pricing import PricingEngine
+from report import ReportManager
+from routes import RoutePlanner
+from seating import SeatingEngine
+from storage import DEFAULT_FILES
+from ticket import TicketSystem
+from waitlist import WaitlistManager
+
+BOOTSTRAP_ADMIN = ("admin", "adminpass", "Primary Admin")  # created once if the username is missing
+
+
+class _Lazy:
+    # built on first access, then stored on the instance so later reads skip the descriptor
+    def __init__(self, build):
+        self.build = build
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, services, owner=None):
+        if services is None:
+            return self
+        with services._lock:
+            value = services.__dict__.get(self.name)
+            if value is None:
+                started = time.perf_counter()
+                value = self.build(services)
+                services.timings[self.name] = time.perf_counter() - started
+                services.__dict__[self.name] = value
+        return value
+
+
+class Services:
+    # one set of managers shared by every session in the process, so all of
+    # them see the same seat maps and write through the same tables.
+    # nothing is read until a page asks for it: the login page only loads admins
+    def __init__(self, data_dir=""):
+        self.data_dir = data_dir
+        self.timings = {}  # manager -> seconds its first access took, including what it loaded first
+        self._lock = threading.RLock()
+        if metrics.ENABLED:
+            metrics.enable()
+
+    def _path(self, table):
+        # the default "" keeps the bare file names, the same keys Customer's user directory uses
+        return os.path.join(self.data_dir, DEFAULT_FILES[table])
+
+    @_Lazy
+    def admin_mgr(self):
+        admin_mgr = AdminManager(self._path("admins"))
+        admin_mgr.ensure_admin(*BOOTSTRAP_ADMIN)
+        return admin_mgr
+
+    @_Lazy
+    def booking_mgr(self):
+        return BookingManager(self._path("bookings"))
+
+    @_Lazy
+    def flight_mgr(self):
+        booking_mgr = self.booking_mgr  # seat maps are rebuilt from the bookings
+        flight_mgr = FlightManager(self._path("flights"))
+        flight_mgr.restore_reservations(booking_mgr)
+        return flight_mgr
+
+    @_Lazy
+    def payment_mgr(self):
+        return PaymentManager(self._path("payments"), ledger_path=self._path("ledger"))
+
+    @_Lazy
+    def seating(self):
+        return SeatingEngine(self.flight_mgr, self.booking_mgr)
+
+    @_Lazy
+    def pricing(self):
+        return PricingEngine(self.flight_mgr, self.booking_mgr)
+
+    @_Lazy
+    def checkout(self):
+        return CheckoutManager(self.seating, self.payment_mgr, pricing=self.pricing)
+
+    @_Lazy
+    def waitlist(self):
+        return WaitlistManager(self.checkout, self._path("waitlist"))
+
+    @_Lazy
+    def ticket_sys(self):
+        return TicketSystem(self.booking_mgr, self.flight_mgr)
+
+    @_Lazy
+    def route_planner(self):
+        return RoutePlanner(self.flight_mgr)
+
+    @_Lazy
+    def report_mgr(self):
+        return ReportManager(self._path("users"), self._path("admins"), flight_manager=self.flight_mgr,
+                             booking_manager=self.booking_mgr, payment_manager=self.payment_mgr,
+                             admin_manager=self.admin_mgr,
+                             archive_dir=os.path.join(self.data_dir, ARCHIVE_DIR))
+
+
+_services = None
+_services_lock = threading.Lock()
+
+
+def get_services():
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                _services = Services()
+    return _services
+
+
+def reset_services():
+    # drop the shared managers so the next get_services() reloads from storage
+    global _services
+    with _services_lock:
+        storage.flush()  # anything still queued would otherwise be lost with the managers
+        _services = None
@@ -0,0 +1,97 @@
+import array
+import json
+import mmap
+import os
+import struct
+
+# binary copy of a parsed csv file, written next to it as <name>.snap:
+#   header   magic, format version, length of the json meta that follows
+#   meta     {"fieldnames", "rows", "size", "mtime_ns", "crc32"} of the csv bytes it was built from
+#   columns  one block per field, in fieldnames order:
+#            PLAIN  the values joined by NUL
+#            DICT   the distinct values joined by NUL, then a uint32 index per row
+MAGIC = b"AIRSNAP\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sHI")  # magic, version, meta bytes
+_BLOCK = struct.Struct("<BIQ")    # encoding, distinct values, text bytes
+PLAIN, DICT = 0, 1
+SEP = "\0"
+
+
+def snapshot_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".snap"
+
+
+def _encode_column(values):
+    distinct = {}
+    for v in values:
+        if v not in distinct:
+            distinct[v] = len(distinct)
+            if len(distinct) * 2 > len(values):
+                break
+    if len(distinct) * 2 <= len(values):
+        text = SEP.join(distinct).encode("utf-8")
+        index = array.array("I", map(distinct.__getitem__, values))
+        return _BLOCK.pack(DICT, len(distinct), len(text)) + text + index.tobytes()
+    text = SEP.join(values).encode("utf-8")
+    return _BLOCK.pack(PLAIN, 0, len(text)) + text
+
+
+def write(path, fieldnames, rows, size, mtime_ns, crc32):
+    # returns the bytes written, or None when a value can't be stored (missing, or holding a NUL)
+    columns = []
+    for name in fieldnames:
+        values = [r.get(name) for r in rows]
+        if None in values:
+            return None
+        values = [v if type(v) is str else str(v) for v in values]
+        if any(SEP in v for v in values):
+            return None
+        columns.append(_encode_column(values))
+    meta = json.dumps({"fieldnames": list(fieldnames), "rows": len(rows), "size": size,
+                       "mtime_ns": mtime_ns, "crc32": crc32}).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        for block in columns:
+            f.write(block)
+        written = f.tell()
+    os.replace(tmp_path, path)
+    return written
+
+
+def read(path):
+    # (meta, rows as dicts, bytes read), or None when the file is missing, from another version or damaged
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, meta_len = _HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION:
+                return None
+            offset = _HEADER.size
+            meta = json.loads(mm[offset:offset + meta_len])
+            offset += meta_len
+            n = meta["rows"]
+            columns = []
+            for _ in meta["fieldnames"]:
+                encoding, distinct, text_len = _BLOCK.unpack_from(mm, offset)
+                offset += _BLOCK.size
+                text = str(mm[offset:offset + text_len], "utf-8")
+                offset += text_len
+                if encoding == DICT:
+                    values = text.split(SEP) if distinct else []
+                    if len(values) != distinct:
+                        return None
+                    index = array.array("I")
+                    index.frombytes(mm[offset:offset + 4 * n])
+                    offset += 4 * n
+                    columns.append(list(map(values.__getitem__, index)))
+                else:
+                    columns.append(text.split(SEP) if n else [])
+                if len(columns[-1]) != n:
+                    return None
+            size = mm.size()
+    except (OSError, ValueError, KeyError, IndexError, struct.error, UnicodeDecodeError):
+        return None
+    fieldnames = meta["fieldnames"]
+    return meta, [dict(zip(fieldnames, values)) for values in zip(*columns)], size
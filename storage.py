@@ -0,0 +1,667 @@
+import argparse
+import atexit
+import csv
+import gc
+import io
+import os
+import sqlite3
+import threading
+import weakref
+import zlib
+from contextlib import ExitStack, contextmanager
+
+import metrics
+import snapshot
+
+# which backend the managers use: "csv" (one file per manager) or "sqlite"
+STORAGE_BACKEND = os.environ.get("AIRLINE_STORAGE", "csv")
+SQLITE_PATH = os.environ.get("AIRLINE_DB", "airline.db")
+COMPACT_EVERY = 500  # journal entries before they are folded back into the csv snapshot
+SNAPSHOT_MIN_ROWS = 1000  # csv tables at least this big also keep a binary <name>.snap for fast loads
+# write-behind: mutations are queued and written by a background thread every FLUSH_INTERVAL
+# seconds, or sooner once a table has FLUSH_BATCH of them pending
+WRITE_BEHIND = os.environ.get("AIRLINE_WRITE_BEHIND", "").lower() in ("1", "true", "yes", "on")
+FLUSH_INTERVAL = float(os.environ.get("AIRLINE_FLUSH_INTERVAL", "0.5"))
+FLUSH_BATCH = int(os.environ.get("AIRLINE_FLUSH_BATCH", "200"))
+
+# table -> (columns, key column, indexed column groups)
+SCHEMAS = {
+    "admins": (["admin_id", "username", "name", "password_hash"], "admin_id", [("username",)]),
+    "users": (["name", "email", "password_hash", "role"], "email", [("name",)]),
+    "flights": (["flight_id", "flight_number", "origin", "destination",
+                 "price", "date", "departure_time", "duration", "airline", "seat_count"],
+                "flight_id", [("origin", "destination"), ("date", "departure_time")]),
+    "bookings": (["booking_id", "customer_username", "flight_id", "seat_no", "date"],
+                 "booking_id", [("customer_username",), ("flight_id",)]),
+    "payments": (["payment_id", "customer_username", "flight_id", "amount", "date", "ref"],
+                 "payment_id", [("customer_username",), ("flight_id",), ("ref",)]),
+    "waitlist": (["entry_id", "customer_username", "flight_id", "priority", "requested_at"],
+                 "entry_id", [("flight_id",)]),
+    "ledger": (["entry_id", "customer_username", "amount", "kind", "ref", "date"],
+               "entry_id", [("customer_username",)]),
+}
+REAL_COLUMNS = {"price", "amount"}
+JOURNALED = {"bookings", "waitlist"}  # csv tables that take deletes through an append-only journal
+
+# the csv files each table lives in when nothing else is configured
+DEFAULT_FILES = {
+    "admins": "admins.csv",
+    "users": "users.csv",
+    "flights": "flights.csv",
+    "bookings": "bookings.csv",
+    "payments": "payments.csv",
+    "waitlist": "waitlist.csv",
+    "ledger": "ledger.csv",
+}
+
+
+@contextmanager
+def paused_gc():
+    # bulk loads allocate hundreds of thousands of objects that all stay alive, and every
+    # cyclic collection triggered on the way rescans them for nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def open_table(name, path, rows=None, backend=None, lock=None):
+    # rows: callable returning the manager's current rows, used when a backend needs a full rewrite.
+    # lock: the manager lock guarding those rows, needed to take a consistent copy for write-behind
+    backend = backend or STORAGE_BACKEND
+    if backend == "sqlite":
+        table = SqliteTable(name, SQLITE_PATH, rows)
+    elif backend != "csv":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    elif name in JOURNALED:
+        table = JournaledCsvTable(name, path, rows)
+    else:
+        table = CsvTable(name, path, rows)
+    return WriteBehindTable(table, lock) if WRITE_BEHIND else table
+
+
+class CsvTable:
+    def __init__(self, name, path, rows=None):
+        self.name = name
+        self.path = path
+        self.fieldnames, self.key, _ = SCHEMAS[name]
+        self.rows = rows
+        self.snapshot_path = snapshot.snapshot_path(path)
+        self._header_checked = False
+
+    def _file_stamp(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def stamp(self):
+        # changes whenever the data on disk changes
+        return self._file_stamp(self.path)
+
+    def load(self):
+        # a snapshot whose crc matches the csv bytes skips the parse; one built from an earlier, shorter
+        # version of the file (the same leading bytes) only needs the rows appended since parsed
+        started = metrics.clock()
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        with f, paused_gc():
+            st = os.fstat(f.fileno())
+            rows = self._load_snapshot(f, st)
+            if rows is None:
+                f.seek(0)
+                data = f.read()
+                reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""))
+                rows = list(reader)
+                metrics.record_io(self.name, "load", started, len(rows), len(data))
+                self._write_snapshot(reader.fieldnames, rows, len(data), st.st_mtime_ns, zlib.crc32(data))
+        return rows
+
+    def _crc(self, f, size):
+        f.seek(0)
+        crc = 0
+        while size > 0:
+            chunk = f.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size -= len(chunk)
+        return crc
+
+    def _load_snapshot(self, f, st):
+        started = metrics.clock()
+        cached = snapshot.read(self.snapshot_path)
+        if cached is None:
+            return None
+        meta, rows, nbytes = cached
+        metrics.record_io(self.name, "load_snapshot", started, len(rows), nbytes)
+        # mtimes are too coarse to catch a quick same-size rewrite, so the bytes are always checked
+        if st.st_size < meta["size"] or self._crc(f, meta["size"]) != meta["crc32"]:
+            return None  # rewritten since the snapshot, not just appended to
+        if st.st_size == meta["size"]:
+            return rows
+        started = metrics.clock()
+        f.seek(meta["size"])
+        tail = f.read()
+        appended = list(csv.DictReader(io.StringIO(tail.decode("utf-8"), newline=""),
+                                       fieldnames=meta["fieldnames"]))
+        metrics.record_io(self.name, "load", started, len(appended), len(tail))
+        rows += appended
+        if len(appended) * 10 > len(rows):
+            self._write_snapshot(meta["fieldnames"], rows, meta["size"] + len(tail), st.st_mtime_ns,
+                                 zlib.crc32(tail, meta["crc32"]))
+        return rows
+
+    def _write_snapshot(self, fieldnames, rows, size, mtime_ns, crc):
+        if len(rows) < SNAPSHOT_MIN_ROWS or not fieldnames:
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+            return
+        started = metrics.clock()
+        nbytes = snapshot.write(self.snapshot_path, fieldnames, rows, size, mtime_ns, crc)
+        if nbytes:
+            metrics.record_io(self.name, "save_snapshot", started, len(rows), nbytes, write=True)
+
+    def save(self, rows=None):
+        # full rewrite through a temp file so a crash never leaves a truncated csv
+        started = metrics.clock()
+        rows = self.rows() if rows is None else rows
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+            nbytes = f.tell()
+        os.replace(tmp_path, self.path)
+        metrics.record_io(self.name, "save", started, len(rows), nbytes, write=True)
+        if len(rows) >= SNAPSHOT_MIN_ROWS or os.path.exists(self.snapshot_path):
+            with open(self.path, "rb") as f:
+                data = f.read()
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            self._write_snapshot(self.fieldnames, rows, len(data), mtime_ns, zlib.crc32(data))
+
+    def insert(self, row):
+        self.insert_many([row])
+
+    def _ends_with_newline(self, path):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _header_matches(self):
+        # files written before a column was added keep the old header until their next rewrite
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), None) == self.fieldnames
+
+    def insert_many(self, rows):
+        started = metrics.clock()
+        rows = list(rows)
+        stamp = self.stamp()
+        if stamp is not None and stamp[1] and not self._header_checked:
+            if not self._header_matches():
+                self.save(self.load() + rows)  # rewritten under the current columns
+                return
+            self._header_checked = True
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            start = f.tell()
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            if stamp is None or stamp[1] == 0:
+                writer.writeheader()
+            elif not self._ends_with_newline(self.path):
+                f.write("\n")  # hand-edited files often lack the final newline
+            writer.writerows(rows)
+            metrics.record_io(self.name, "append", started, len(rows), f.tell() - start, write=True)
+
+    def update(self, row):
+        self.save()
+
+    def delete(self, key):
+        self.save()
+
+    def delete_many(self, keys):
+        self.save()
+
+    def position(self):
+        # where the next append lands, for load_since on append-only tables
+        stamp = self.stamp()
+        return stamp[1] if stamp else 0
+
+    def load_since(self, position):
+        # rows appended after an earlier position(); None if the file has been rewritten shorter since
+        if not position:
+            return self.load()
+        started = metrics.clock()
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_size < position:
+                return None
+            fieldnames = next(csv.reader([f.readline().decode("utf-8")]), None)
+            f.seek(position)
+            tail = f.read()
+        rows = [row for row in csv.DictReader(io.StringIO(tail.decode("utf-8"), newline=""), fieldnames=fieldnames)
+                if None not in row.values()]  # a torn last line is picked up once it is complete
+        metrics.record_io(self.name, "load", started, len(rows), len(tail))
+        return rows
+
+    def needs_rows(self, ops):
+        # whether apply(ops) rewrites the whole file, and so needs a copy of the current rows
+        return any(op != "insert" for op, _ in ops)
+
+    def apply(self, ops, rows=None):
+        # a batch of ("insert" | "update" | "delete", row or key): inserts become one append,
+        # anything else one full rewrite from `rows`, which already reflects every op in the batch
+        if self.needs_rows(ops):
+            self.save(rows)
+        else:
+            self.insert_many(row for _, row in ops)
+
+
+class JournaledCsvTable(CsvTable):
+    # the csv is a snapshot, inserts and deletes are appended to <name>.journal
+    # and folded back in by save() every COMPACT_EVERY entries
+    def __init__(self, name, path, rows=None):
+        super().__init__(name, path, rows)
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.journal_entries = 0
+
+    def stamp(self):
+        return (self._file_stamp(self.path), self._file_stamp(self.journal_path))
+
+    def load(self):
+        loaded = {row[self.key]: row for row in super().load()}
+        self.journal_entries = 0
+        started = metrics.clock()
+        try:
+            with open(self.journal_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if None in row.values():
+                        continue  # torn line from a crash mid-append
+                    op = row.pop("op")
+                    if op in ("add", "update"):
+                        loaded[row[self.key]] = row
+                    elif op == "delete":
+                        loaded.pop(row[self.key], None)
+                    self.journal_entries += 1
+                metrics.record_io(self.name, "load_journal", started, self.journal_entries,
+                                  os.fstat(f.fileno()).st_size)
+            self._repair_journal()
+        except FileNotFoundError:
+            pass
+        return list(loaded.values())
+
+    def _repair_journal(self):
+        # drop a trailing partial line so the next append starts on a fresh row
+        with open(self.journal_path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _append(self, entries, rows=None):
+        started = metrics.clock()
+        stamp = self._file_stamp(self.journal_path)
+        with open(self.journal_path, "a", newline="", encoding="utf-8") as f:
+            start = f.tell()
+            writer = csv.DictWriter(f, fieldnames=["op"] + self.fieldnames)
+            if stamp is None or stamp[1] == 0:
+                writer.writeheader()
+            for op, row in entries:
+                writer.writerow(dict(row, op=op))
+            metrics.record_io(self.name, "append_journal", started, len(entries), f.tell() - start, write=True)
+        self.journal_entries += len(entries)
+        if self.journal_entries >= COMPACT_EVERY and (rows is not None or self.rows is not None):
+            self.save(rows)
+
+    def save(self, rows=None):
+        super().save(rows)
+        open(self.journal_path, "w").close()
+        self.journal_entries = 0
+
+    def insert(self, row):
+        self._append([("add", row)])
+
+    def insert_many(self, rows):
+        self._append([("add", row) for row in rows])
+
+    def update(self, row):
+        self._append([("update", row)])
+
+    def delete(self, key):
+        self._append([("delete", {self.key: key})])
+
+    def delete_many(self, keys):
+        self._append([("delete", {self.key: key}) for key in keys])
+
+    def needs_rows(self, ops):
+        return self.journal_entries + len(ops) >= COMPACT_EVERY and self.rows is not None
+
+    def apply(self, ops, rows=None):
+        entries = {"insert": "add", "update": "update", "delete": "delete"}
+        self._append([(entries[op], {self.key: value} if op == "delete" else value) for op, value in ops], rows)
+
+
+class Database:
+    # one shared connection per sqlite file, serialized by a lock
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._depth = 0
+        self._after_commit = []
+        self.changes = {}  # table -> writes made through this process
+
+    @classmethod
+    def get(cls, path):
+        with cls._instances_lock:
+            db = cls._instances.get(path)
+            if db is None:
+                db = cls._instances[path] = cls(path)
+            return db
+
+    def after_commit(self, callback):
+        # runs callback once the current transaction commits (dropped on rollback), or right away outside one
+        with self.lock:
+            if self._depth:
+                self._after_commit.append(callback)
+                return
+        callback()
+
+    @contextmanager
+    def transaction(self):
+        # nested calls join the outermost transaction
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self.conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                    self._after_commit = []
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+                callbacks, self._after_commit = self._after_commit, []
+                for callback in callbacks:
+                    callback()
+
+
+class SqliteTable:
+    def __init__(self, name, db_path, rows=None):
+        self.name = name
+        self.fieldnames, self.key, indexes = SCHEMAS[name]
+        self.rows = rows
+        self.db = Database.get(db_path)
+        columns = ", ".join(
+            f"{c} {'REAL' if c in REAL_COLUMNS else 'TEXT'}{' PRIMARY KEY' if c == self.key else ''}"
+            for c in self.fieldnames
+        )
+        with self.db.transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {name} ({columns})")
+            existing = {r[1] for r in conn.execute(f"PRAGMA table_info({name})")}
+            for c in self.fieldnames:
+                if c not in existing:  # added to the schema after this database was created
+                    conn.execute(f"ALTER TABLE {name} ADD COLUMN {c} {'REAL' if c in REAL_COLUMNS else 'TEXT'}")
+            for group in indexes:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{'_'.join(group)} "
+                             f"ON {name} ({', '.join(group)})")
+        self._insert_sql = (f"INSERT OR REPLACE INTO {name} ({', '.join(self.fieldnames)}) "
+                            f"VALUES ({', '.join('?' for _ in self.fieldnames)})")
+
+    def stamp(self):
+        # data_version moves on commits from other connections, changes on our own writes
+        with self.db.lock:
+            version = self.db.conn.execute("PRAGMA data_version").fetchone()[0]
+            return (version, self.db.changes.get(self.name, 0))
+
+    def _touch(self):
+        self.db.changes[self.name] = self.db.changes.get(self.name, 0) + 1
+
+    def load(self):
+        started = metrics.clock()
+        with self.db.lock:
+            cur = self.db.conn.execute(f"SELECT {', '.join(self.fieldnames)} FROM {self.name} ORDER BY rowid")
+            rows = [dict(zip(self.fieldnames, r)) for r in cur]
+        metrics.record_io(self.name, "load", started, len(rows))
+        return rows
+
+    def _values(self, row):
+        return [row.get(c, "") for c in self.fieldnames]
+
+    def position(self):
+        with self.db.lock:
+            return self.db.conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {self.name}").fetchone()[0]
+
+    def load_since(self, position):
+        started = metrics.clock()
+        with self.db.lock:
+            cur = self.db.conn.execute(f"SELECT {', '.join(self.fieldnames)} FROM {self.name} "
+                                       f"WHERE rowid > ? ORDER BY rowid", (position,))
+            rows = [dict(zip(self.fieldnames, r)) for r in cur]
+        metrics.record_io(self.name, "load", started, len(rows))
+        return rows
+
+    def save(self, rows=None):
+        started = metrics.clock()
+        rows = self.rows() if rows is None else rows
+        with self.db.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.name}")
+            conn.executemany(self._insert_sql, (self._values(r) for r in rows))
+            self._touch()
+        metrics.record_io(self.name, "save", started, len(rows), write=True)
+
+    def insert(self, row):
+        self.insert_many([row])
+
+    def insert_many(self, rows):
+        started = metrics.clock()
+        rows = list(rows)
+        with self.db.transaction() as conn:
+            conn.executemany(self._insert_sql, (self._values(r) for r in rows))
+            self._touch()
+        metrics.record_io(self.name, "append", started, len(rows), write=True)
+
+    def update(self, row):
+        started = metrics.clock()
+        others = [c for c in self.fieldnames if c != self.key]
+        with self.db.transaction() as conn:
+            conn.execute(f"UPDATE {self.name} SET {', '.join(f'{c} = ?' for c in others)} WHERE {self.key} = ?",
+                         [row[c] for c in others] + [row[self.key]])
+            self._touch()
+        metrics.record_io(self.name, "update", started, 1, write=True)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        started = metrics.clock()
+        keys = list(keys)
+        with self.db.transaction() as conn:
+            conn.executemany(f"DELETE FROM {self.name} WHERE {self.key} = ?", ((key,) for key in keys))
+            self._touch()
+        metrics.record_io(self.name, "delete", started, len(keys), write=True)
+
+    def needs_rows(self, ops):
+        return False
+
+    def apply(self, ops, rows=None):
+        # the whole batch commits as one transaction
+        with self.db.transaction():
+            for op, value in ops:
+                if op == "insert":
+                    self.insert(value)
+                elif op == "update":
+                    self.update(value)
+                else:
+                    self.delete(value)
+
+
+class WriteBehindTable:
+    # queues insert / update / delete in memory and lets the background writer apply them in batches,
+    # so a burst of edits costs one rewrite instead of one per edit. reads go to the wrapped table and
+    # see the data as of the last flush.
+    # lock order: the manager lock, then _write_lock; the lock is never taken while holding _write_lock
+    def __init__(self, table, lock=None):
+        self.table = table
+        self.lock = lock or threading.RLock()
+        self.pending = []
+        self._write_lock = threading.Lock()  # one batch on disk at a time, in queue order
+        _writer.register(self)
+
+    def __getattr__(self, attr):
+        return getattr(self.table, attr)
+
+    def _queue(self, ops):
+        with self.lock:
+            self.pending.extend(ops)
+            backlog = len(self.pending)
+        if backlog >= FLUSH_BATCH:
+            _writer.wake()
+
+    def insert(self, row):
+        self._queue([("insert", dict(row))])
+
+    def insert_many(self, rows):
+        self._queue([("insert", dict(row)) for row in rows])
+
+    def update(self, row):
+        self._queue([("update", dict(row))])
+
+    def delete(self, key):
+        self._queue([("delete", key)])
+
+    def delete_many(self, keys):
+        self._queue([("delete", key) for key in keys])
+
+    def save(self, rows=None):
+        # a full rewrite supersedes everything queued
+        with self.lock, self._write_lock:
+            self.pending = []
+            self.table.save(list(self.table.rows()) if rows is None and self.table.rows else rows)
+
+    def flush(self):
+        with self.lock:
+            self._write_lock.acquire()
+            ops, self.pending = self.pending, []
+            # copied under the manager lock, so the rows match the ops taken exactly
+            rows = list(self.table.rows()) if ops and self.table.needs_rows(ops) else None
+        error = None
+        try:
+            if ops:
+                self.table.apply(ops, rows)
+        except Exception as e:
+            error = e
+        finally:
+            self._write_lock.release()
+        if error is not None:
+            with self.lock:
+                self.pending[:0] = ops  # retried on the next flush
+            raise error
+
+
+class _Writer:
+    # the one background thread flushing every write-behind table
+    def __init__(self):
+        self.tables = weakref.WeakSet()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.urgent = False
+
+    def register(self, table):
+        with self.cond:
+            self.tables.add(table)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self.thread.start()
+
+    def wake(self):
+        with self.cond:
+            self.urgent = True
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.urgent:
+                    self.cond.wait(FLUSH_INTERVAL)
+                self.urgent = False
+            for table in list(self.tables):
+                try:
+                    table.flush()
+                except Exception as e:
+                    print(f"Write-behind flush of {table.name} failed, will retry: {e}")
+
+    def flush_all(self):
+        for table in list(self.tables):
+            table.flush()
+
+
+_writer = _Writer()
+
+
+def flush():
+    # writes everything queued by write-behind tables; a no-op when write-behind is off
+    _writer.flush_all()
+
+
+atexit.register(flush)
+
+
+@contextmanager
+def group_commit(*tables):
+    # writes made through these tables inside the block commit together: sqlite tables sharing a
+    # database join one transaction (one commit, and a failure rolls all of them back).
+    # csv files cannot share a commit and write as they go; write-behind tables already batch.
+    # take the managers' locks before entering, the database lock is held until the block ends
+    with ExitStack() as stack:
+        databases = {}
+        for table in tables:
+            if isinstance(table, SqliteTable):
+                databases.setdefault(table.db.path, table.db)
+        for db in databases.values():
+            stack.enter_context(db.transaction())
+        yield
+
+
+def migrate_csv_to_sqlite(db_path=SQLITE_PATH, files=None):
+    # one-shot copy of every csv table into the sqlite database
+    files = dict(DEFAULT_FILES, **(files or {}))
+    counts = {}
+    for name, path in files.items():
+        source = JournaledCsvTable(name, path) if name in JOURNALED else CsvTable(name, path)
+        rows = source.load()
+        SqliteTable(name, db_path).save(rows)
+        counts[name] = len(rows)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Airline storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="copy the csv files into a sqlite database")
+    migrate.add_argument("--db", default=SQLITE_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        for name, count in migrate_csv_to_sqlite(args.db).items():
+            print(f"{name}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
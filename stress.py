@@ -0,0 +1,106 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import storage
+from booking import BookingManager
+from flight import Flight, FlightManager
+
+
+class _Admin:
+    role = "admin"
+
+
+def run(threads=32, attempts=200, flights=4, seats=150, backend="csv", seed=0):
+    # many threads race for the same seats on shared managers; every seat may be sold at most once
+    # and everything sold must still be there after a reload from disk
+    sqlite_path = storage.SQLITE_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.SQLITE_PATH = os.path.join(tmp, "stress.db")
+        try:
+            return _run(tmp, threads, attempts, flights, seats, backend, seed)
+        finally:
+            storage.SQLITE_PATH = sqlite_path
+
+
+def _run(tmp, threads, attempts, flights, seats, backend, seed):
+    flights_file = os.path.join(tmp, "flights.csv")
+    bookings_file = os.path.join(tmp, "bookings.csv")
+
+    flight_mgr = FlightManager(flights_file, backend=backend)
+    booking_mgr = BookingManager(bookings_file, backend=backend)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(flights):
+            flight_mgr.add_flight(_Admin(), Flight(f"ST{n}", "A", "B", 100.0, "2030-01-01",
+                                                   "10:00:00", "01:00:00", "Stress", seat_count=seats))
+    flight_ids = list(flight_mgr.flights)
+
+    sold = []
+    sold_lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        barrier.wait()
+        for _ in range(attempts):
+            flight_id = rng.choice(flight_ids)
+            seat_no = f"S{rng.randint(1, seats)}"
+            b = booking_mgr.create_booking(f"user{n}", flight_mgr, flight_id, seat_no)
+            if b:
+                with sold_lock:
+                    sold.append((flight_id, seat_no))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+    elapsed = time.perf_counter() - started
+
+    errors = []
+    if len(sold) != len(set(sold)):
+        errors.append(f"{len(sold) - len(set(sold))} seats sold twice")
+    reserved = sum(f.seats.reserved_count for f in flight_mgr.flights.values())
+    if reserved != len(sold):
+        errors.append(f"seat maps hold {reserved} reservations for {len(sold)} bookings")
+    storage.flush()
+    reloaded = BookingManager(bookings_file, backend=backend).bookings
+    on_disk = {(b.flight_id, b.seat_no) for b in reloaded}
+    if len(reloaded) != len(sold) or on_disk != set(sold):
+        errors.append(f"{len(sold)} bookings made but {len(reloaded)} found after reload")
+
+    return {
+        "threads": threads,
+        "attempts": threads * attempts,
+        "sold": len(sold),
+        "seconds": round(elapsed, 3),
+        "bookings_per_second": round(threads * attempts / elapsed, 1) if elapsed else None,
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent booking stress test")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=200, help="booking attempts per thread")
+    parser.add_argument("--flights", type=int, default=4)
+    parser.add_argument("--seats", type=int, default=150)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    args = parser.parse_args(argv)
+
+    result = run(args.threads, args.attempts, args.flights, args.seats, args.backend)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,39 +6,52 @@ class TicketSystem:
         self.booking_manager = booking_manager
         self.flight_manager = flight_manager
 
-    def print_ticket(self, booking_id: str):
-        # البحث عن الحجز
-        booking = None
-        for b in self.booking_manager.bookings:
-            if b.booking_id == booking_id:
-                booking = b
-                break
-
+    def ticket(self, booking_id: str):
+        # the ticket's fields as a dict, or None when the booking or its flight is missing
+        booking = self.booking_manager.get_booking(booking_id)
         if not booking:
             print("Booking not found")
-            return
+            return None
 
-        # البحث عن الرحلة
         flight = self.flight_manager.flights.get(booking.flight_id)
         if not flight:
             print("Flight info not found")
+            return None
+
+        return {
+            "booking_id": booking.booking_id,
+            "customer": booking.customer_username,
+            "flight_number": flight.flight_number,
+            "airline": flight.airline,
+            "origin": flight.origin,
+            "destination": flight.destination,
+            "price": flight.price,
+            "date": flight.date,
+            "departure_time": flight.departure_time,
+            "duration": flight.duration,
+            "seat_no": booking.seat_no,
+            "booking_date": booking.date,
+        }
+
+    def print_ticket(self, booking_id: str):
+        t = self.ticket(booking_id)
+        if not t:
             return
 
         # طباعة كل المعلومات
         print("----- TICKET -----")
-        print(f"Booking ID: {booking.booking_id}")
-        print(f"Customer: {booking.customer_username}")
-        print(f"Flight Number: {flight.flight_number}")
-        print(f"Airline: {flight.airline}")
-        print(f"From: {flight.origin} To: {flight.destination}")
-        print(f"Price: {flight.price}")
-        print(f"Date: {flight.date} Departure: {flight.departure_time}")
-        print(f"Duration: {flight.duration}")
-        print(f"Seat: {booking.seat_no}")
-        print(f"Booking Date: {booking.date}")
+        print(f"Booking ID: {t['booking_id']}")
+        print(f"Customer: {t['customer']}")
+        print(f"Flight Number: {t['flight_number']}")
+        print(f"Airline: {t['airline']}")
+        print(f"From: {t['origin']} To: {t['destination']}")
+        print(f"Price: {t['price']}")
+        print(f"Date: {t['date']} Departure: {t['departure_time']}")
+        print(f"Duration: {t['duration']}")
+        print(f"Seat: {t['seat_no']}")
+        print(f"Booking Date: {t['booking_date']}")
         print("------------------")
 
     def print_all_tickets_for_customer(self, customer_username: str):
-        for b in self.booking_manager.bookings:
-            if b.customer_username == customer_username:
-                self.print_ticket(b.booking_id)
+        for b in self.booking_manager.bookings_for_customer(customer_username):
+            self.print_ticket(b.booking_id)
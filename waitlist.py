@@ -0,0 +1,238 @@
+import heapq
+import math
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from customer import Customer
+from events import EventSource
+from ledger import OPENING_BALANCE
+from storage import open_table, paused_gc
+
+WAITLIST_FILE = "waitlist.csv"
+# a full flight queues at most ceil(seats * WAITLIST_RATIO) waitlisted requests; seats are never oversold
+WAITLIST_RATIO = float(os.environ.get("AIRLINE_WAITLIST_RATIO", "0.1"))
+
+
+class WaitlistEntry:
+    def __init__(self, customer_username: str, flight_id: str, priority: int = 0):
+        self.entry_id = str(uuid.uuid4())
+        self.customer_username = customer_username
+        self.flight_id = flight_id
+        self.priority = priority  # lower goes first
+        self.requested_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    @classmethod
+    def from_row(cls, row):
+        e = cls.__new__(cls)
+        e.entry_id = row["entry_id"]
+        e.customer_username = row["customer_username"]
+        e.flight_id = row["flight_id"]
+        e.priority = int(row["priority"])
+        e.requested_at = row["requested_at"]
+        return e
+
+    def sort_key(self):
+        return (self.priority, self.requested_at, self.entry_id)
+
+
+class WaitlistManager(EventSource):
+    # customers queued for full flights, one heap per flight ordered by (priority, request time).
+    # a cancelled booking promotes the head of its flight's heap: the freed seat is booked and
+    # paid for through a checkout keyed by the entry id, so a promotion interrupted before the
+    # entry was dropped is never booked twice.
+    # withdrawn entries are dropped from the heap lazily, when they reach the top.
+    # events: "load" (None), "add", "leave" and "promote" (the WaitlistEntry)
+    def __init__(self, checkout, file_path=WAITLIST_FILE, limit=None, backend=None):
+        self.checkout = checkout
+        self.flight_manager = checkout.flight_manager
+        self.booking_manager = checkout.booking_manager
+        self.pricing = checkout.pricing
+        self.limit = limit  # per-flight cap; None derives it from the seat count and WAITLIST_RATIO
+        self.customers = {}  # username -> the Customer whose wallet pays on promotion
+        self._lock = threading.RLock()
+        self.table = open_table("waitlist", file_path, rows=self._rows, backend=backend, lock=self._lock)
+        self.entries = {}   # entry_id -> WaitlistEntry, live entries only
+        self._heaps = {}    # flight_id -> [(sort key, entry_id)], may hold withdrawn entries
+        self._by_flight = {}    # flight_id -> {entry_id} of live entries
+        self._by_customer = {}  # customer_username -> {flight_id: entry_id}
+        self.load_waitlist()
+        self.booking_manager.subscribe(self._on_booking_event)
+        self.flight_manager.subscribe(self._on_flight_event)
+        self.catch_up()
+
+    def close(self):
+        self.booking_manager.unsubscribe(self._on_booking_event)
+        self.flight_manager.unsubscribe(self._on_flight_event)
+
+    def load_waitlist(self):
+        # heapify per flight is O(n), cheaper than n pushes
+        with self._lock, paused_gc():
+            entries = [WaitlistEntry.from_row(row) for row in self.table.load()]
+            self.entries = {e.entry_id: e for e in entries}
+            heaps, self._by_flight, self._by_customer = {}, {}, {}
+            for e in entries:
+                heaps.setdefault(e.flight_id, []).append((e.sort_key(), e.entry_id))
+                self._index(e)
+            for heap in heaps.values():
+                heapq.heapify(heap)
+            self._heaps = heaps
+            self._emit("load")
+
+    def _row(self, e):
+        return {
+            "entry_id": e.entry_id,
+            "customer_username": e.customer_username,
+            "flight_id": e.flight_id,
+            "priority": e.priority,
+            "requested_at": e.requested_at
+        }
+
+    def _rows(self):
+        return [self._row(e) for e in self.entries.values()]
+
+    def waitlist_cap(self, flight):
+        if self.limit is not None:
+            return self.limit
+        return math.ceil(len(flight.seats) * WAITLIST_RATIO)
+
+    def _index(self, e):
+        self._by_flight.setdefault(e.flight_id, set()).add(e.entry_id)
+        self._by_customer.setdefault(e.customer_username, {})[e.flight_id] = e.entry_id
+
+    def _unindex(self, e):
+        flight_entries = self._by_flight[e.flight_id]
+        flight_entries.discard(e.entry_id)
+        if not flight_entries:
+            del self._by_flight[e.flight_id]
+        customer_entries = self._by_customer[e.customer_username]
+        del customer_entries[e.flight_id]
+        if not customer_entries:
+            del self._by_customer[e.customer_username]
+
+    def size(self, flight_id):
+        return len(self._by_flight.get(flight_id, ()))
+
+    def join(self, customer, flight_id, priority=0):
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            print("Flight not found")
+            return None
+        if flight.seats.free_count():
+            print("Seats are still available on this flight")
+            return None
+        username = customer.username
+        with self._lock:
+            self.customers[username] = customer
+            entry_id = self._by_customer.get(username, {}).get(flight_id)
+            if entry_id is not None:
+                print("Already on the waitlist")
+                return self.entries[entry_id]
+            if self.size(flight_id) >= self.waitlist_cap(flight):
+                print("Waitlist is full")
+                return None
+            entry = WaitlistEntry(username, flight_id, priority)
+            self.table.insert(self._row(entry))
+            self.entries[entry.entry_id] = entry
+            self._index(entry)
+            heapq.heappush(self._heaps.setdefault(flight_id, []), (entry.sort_key(), entry.entry_id))
+            self._emit("add", entry)
+        print(f"{username} waitlisted on {flight.flight_number}")
+        return entry
+
+    def leave(self, entry_id):
+        with self._lock:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                print("Waitlist entry not found")
+                return None
+            self._drop(entry)
+            self._emit("leave", entry)
+        print(f"{entry.customer_username} left the waitlist")
+        return entry
+
+    def _drop(self, entry):
+        # lock held; the heap item stays behind and is skipped when it surfaces
+        self.table.delete(entry.entry_id)
+        del self.entries[entry.entry_id]
+        self._unindex(entry)
+        if not self.size(entry.flight_id):
+            self._heaps.pop(entry.flight_id, None)
+        elif len(self._heaps[entry.flight_id]) > 2 * self.size(entry.flight_id) + 16:
+            # mostly withdrawn entries: rebuild rather than let them pile up
+            heap = [item for item in self._heaps[entry.flight_id] if item[1] in self.entries]
+            heapq.heapify(heap)
+            self._heaps[entry.flight_id] = heap
+
+    def _head(self, flight_id):
+        heap = self._heaps.get(flight_id)
+        while heap and heap[0][1] not in self.entries:
+            heapq.heappop(heap)
+        return self.entries[heap[0][1]] if heap else None
+
+    def position(self, entry_id):
+        # 1-based place in the queue; O(live entries on the flight)
+        with self._lock:
+            entry = self.entries[entry_id]
+            key = entry.sort_key()
+            return 1 + sum(1 for eid in self._by_flight[entry.flight_id] if self.entries[eid].sort_key() < key)
+
+    def for_customer(self, customer_username):
+        # oldest request first
+        with self._lock:
+            entries = [self.entries[eid] for eid in self._by_customer.get(customer_username, {}).values()]
+        return sorted(entries, key=lambda e: e.requested_at)
+
+    def promote(self, flight_id):
+        # books the next customer who can pay into a free seat on the flight; returns the Booking or None
+        flight = self.flight_manager.flights.get(flight_id)
+        if flight is None:
+            return None
+        with self._lock:
+            while flight.seats.free_count():
+                entry = self._head(flight_id)
+                if entry is None:
+                    return None
+                customer = self._payer(entry.customer_username)
+                fare = self.pricing.quote(flight_id) if self.pricing else flight.price
+                if self.checkout.payment_manager.balance(customer) < fare:
+                    print(f"{entry.customer_username} cannot cover {fare}, dropped from the waitlist")
+                    self._drop(entry)
+                    self._emit("leave", entry)
+                    continue
+                receipt = self.checkout.checkout(customer, flight_id, key=entry.entry_id)
+                if receipt is None:
+                    return None  # the seat went elsewhere first
+                self._drop(entry)
+                self._emit("promote", entry)
+                print(f"{entry.customer_username} promoted from the waitlist on {flight.flight_number}")
+                return receipt.bookings[0]
+        return None
+
+    def catch_up(self):
+        # seats freed while no waitlist was listening (another process, or before this one loaded)
+        for flight_id in list(self._by_flight):
+            self.promote(flight_id)
+
+    def _payer(self, username):
+        # the Customer who joined, or after a restart a stand-in whose balance comes from the
+        # ledger (without one it starts from the opening balance, the same as at their next login)
+        customer = self.customers.get(username)
+        if customer is None:
+            customer = Customer(email=username)
+            customer.username = username
+            self.checkout.payment_manager.open_account(customer, OPENING_BALANCE)
+            self.customers[username] = customer
+        return customer
+
+    def _on_booking_event(self, event, booking):
+        if event == "cancel":
+            self.promote(booking.flight_id)
+
+    def _on_flight_event(self, event, flight):
+        if event == "delete":
+            with self._lock:
+                for entry in [self.entries[eid] for eid in self._by_flight.get(flight.flight_id, ())]:
+                    self._drop(entry)
+                    self._emit("leave", entry)